@@ -287,9 +287,12 @@ https://www.elastic.co/guide/en/elasticsearch/guide/current/_talking_to_elastics
 
 from __future__ import absolute_import, print_function
 
-from .api import RecordsSearch
+import sys
+import types
+
 from .ext import InvenioSearch
-from .proxies import current_search, current_search_client
+from .proxies import current_search, current_search_client, \
+    current_search_clients
 from .version import __version__
 
 __all__ = (
@@ -298,4 +301,35 @@ __all__ = (
     'RecordsSearch',
     'current_search',
     'current_search_client',
+    'current_search_clients',
 )
+
+
+def __getattr__(name):
+    """Import the search API lazily, it loads Elasticsearch DSL."""
+    if name == 'RecordsSearch':
+        from .api import RecordsSearch
+        setattr(sys.modules[__name__], name, RecordsSearch)
+        return RecordsSearch
+    raise AttributeError(
+        "module '{0}' has no attribute '{1}'".format(__name__, name))
+
+
+if sys.version_info < (3, 7):
+    # Module ``__getattr__`` (PEP 562) is only called since Python 3.7.
+    class _LazyModule(types.ModuleType):
+        """Module resolving its missing attributes with ``__getattr__``."""
+
+        def __getattr__(self, name):
+            """Resolve a missing attribute."""
+            return __getattr__(name)
+
+    if sys.version_info >= (3, 5):
+        sys.modules[__name__].__class__ = _LazyModule
+    else:
+        # Keep a reference to the original module, its globals are cleared
+        # when it is garbage collected.
+        _module = _LazyModule(__name__, __doc__)
+        _module.__dict__.update(globals())
+        _module._original_module = sys.modules[__name__]
+        sys.modules[__name__] = _module
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015-2018 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Discovery of entry points and package resources.
+
+Importing ``pkg_resources`` scans all the installed distributions, which is
+slow in large environments. Entry points are therefore discovered with
+``importlib.metadata`` (or its ``importlib_metadata`` backport) and package
+resources are read directly from the package directory. ``pkg_resources`` is
+only imported, lazily, when neither is possible (e.g. zipped packages). The
+version of the Elasticsearch client is read from its metadata as well, so
+that registering mappings does not import the client.
+"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+from collections import namedtuple
+from importlib import import_module
+
+try:
+    from importlib.metadata import distributions, version
+except ImportError:
+    try:
+        from importlib_metadata import distributions, version
+    except ImportError:
+        distributions = version = None
+
+Distribution = namedtuple('Distribution', ('project_name', 'version'))
+
+
+class EntryPoint(object):
+    """Entry point providing the ``pkg_resources`` attributes we use."""
+
+    def __init__(self, entry_point, dist):
+        """Wrap an ``importlib.metadata`` entry point."""
+        self._entry_point = entry_point
+        self.name = entry_point.name
+        self.module_name = entry_point.value.split(':')[0].split('[')[0] \
+            .strip()
+        self.dist = dist
+
+    def load(self):
+        """Load the object referenced by the entry point."""
+        return self._entry_point.load()
+
+
+def iter_entry_points(group, name=None):
+    """Yield entry points of a group, like ``pkg_resources``.
+
+    :param group: The entry point group.
+    :param name: Only yield entry points with this name.
+    """
+    if distributions is None:
+        from pkg_resources import iter_entry_points as _iter_entry_points
+        for ep in _iter_entry_points(group=group, name=name):
+            yield ep
+        return
+
+    seen = set()
+    for dist in distributions():
+        project_name = dist.metadata['Name']
+        if project_name in seen:
+            continue
+        seen.add(project_name)
+        for ep in dist.entry_points:
+            if ep.group == group and (name is None or ep.name == name):
+                yield EntryPoint(
+                    ep, Distribution(project_name, dist.version))
+
+
+def es_major_version():
+    """Return the major version of the installed Elasticsearch client."""
+    if 'elasticsearch' not in sys.modules and version is not None:
+        try:
+            return int(version('elasticsearch').split('.')[0])
+        except (ImportError, ValueError):
+            # Missing or unusual metadata, ask the client.
+            pass
+    from elasticsearch import VERSION as ES_VERSION
+    return ES_VERSION[0]
+
+
+def _resource_path(package, resource_name):
+    """Return the path of a resource, if the package is a directory."""
+    module = import_module(package)
+    filename = getattr(module, '__file__', None)
+    if filename:
+        base = os.path.dirname(filename)
+    else:
+        base = next(iter(getattr(module, '__path__', [])), None)
+    if base and os.path.isdir(base):
+        return os.path.join(base, *resource_name.split('/'))
+
+
+def resource_filename(package, resource_name):
+    """Return the filename of a package resource."""
+    path = _resource_path(package, resource_name)
+    if path is None:
+        from pkg_resources import resource_filename as _resource_filename
+        return _resource_filename(package, resource_name)
+    return path
+
+
+def resource_isdir(package, resource_name):
+    """Check if a package resource is a directory."""
+    path = _resource_path(package, resource_name)
+    if path is None:
+        from pkg_resources import resource_isdir as _resource_isdir
+        return _resource_isdir(package, resource_name)
+    return os.path.isdir(path)
+
+
+def resource_listdir(package, resource_name):
+    """List the content of a package resource directory.
+
+    :raises OSError: With ``errno.ENOENT`` if the directory does not exist.
+    """
+    path = _resource_path(package, resource_name)
+    if path is None:
+        from pkg_resources import resource_listdir as _resource_listdir
+        return _resource_listdir(package, resource_name)
+    return os.listdir(path)
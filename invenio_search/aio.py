@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015-2018 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Asynchronous search API.
+
+Searches and index management run on an :mod:`asyncio` event loop through the
+client of the ``elasticsearch-async`` package (Elasticsearch 5 and later,
+Python 3.5 and later):
+
+.. code-block:: python
+
+    from invenio_search.aio import AsyncRecordsSearch
+
+    async def titles():
+        response = await AsyncRecordsSearch().query('match_all').execute()
+        return [hit.title for hit in response]
+
+The client is configured like the synchronous one (``SEARCH_CLIENT_CONFIG``
+and ``SEARCH_CLIENTS``), except for the connection class.
+"""
+
+from __future__ import absolute_import, print_function
+
+import asyncio
+from collections import deque
+
+from elasticsearch_dsl.connections import connections
+from werkzeug.local import LocalProxy
+
+from .api import RecordsSearch
+from .ext import _get_aliases, _get_index_files
+from .proxies import current_search
+
+
+class AsyncRecordsSearch(RecordsSearch):
+    """Records search executed with the asynchronous client."""
+
+    def __init__(self, **kwargs):
+        """Use the asynchronous client of ``Meta.client_name``."""
+        client_name = getattr(self.Meta, 'client_name', None) or 'default'
+        kwargs.setdefault('using', LocalProxy(
+            lambda: current_search.get_async_client(client_name)))
+        super(AsyncRecordsSearch, self).__init__(**kwargs)
+
+    async def execute(self, ignore_cache=False):
+        """Execute the search and return the response."""
+        if ignore_cache or not hasattr(self, '_response'):
+            es = connections.get_connection(self._using)
+            self._response = self._response_class(self, await es.search(
+                index=self._index,
+                doc_type=self._get_doc_type(),
+                body=self.to_dict(),
+                **self._params
+            ))
+        return self._response
+
+    async def count(self):
+        """Return the number of hits matching the search."""
+        self._apply_routing()
+        es = connections.get_connection(self._using)
+        response = await es.count(
+            index=self._index,
+            doc_type=self._get_doc_type(),
+            body=self.to_dict(count=True),
+            **self._params
+        )
+        return response['count']
+
+    def delete(self):
+        """Not supported, use the client's ``delete_by_query``."""
+        _unsupported('delete')
+
+    def mget(self, ids):
+        """Not supported, search the records with ``get_records``."""
+        _unsupported('mget')
+
+    def iter_records(self, *args, **kwargs):
+        """Not supported, search the records with ``get_records``."""
+        _unsupported('iter_records')
+
+    def iter_hits(self, *args, **kwargs):
+        """Not supported, iterate over the hits with ``scan``."""
+        _unsupported('iter_hits')
+
+    def parallel_scan(self, *args, **kwargs):
+        """Not supported, iterate over the hits with ``scan``."""
+        _unsupported('parallel_scan')
+
+    def execute_deferred(self):
+        """Not supported, gather the ``execute`` coroutines instead."""
+        _unsupported('execute_deferred')
+
+    def scan(self):
+        """Return an asynchronous iterator over all the matching documents.
+
+        .. code-block:: python
+
+            async for hit in AsyncRecordsSearch().scan():
+                ...
+
+        Use ``params`` to set the ``scroll`` timeout (default: ``5m``), the
+        ``size`` of the batches and ``preserve_order``.
+        """
+        return _AsyncScan(self)
+
+
+def _unsupported(name):
+    """Raise an error for a synchronous method of asynchronous searches."""
+    raise NotImplementedError(
+        'AsyncRecordsSearch.{0}() is not supported, it requires the '
+        'synchronous client (see RecordsSearch.{0}).'.format(name))
+
+
+class _AsyncScan(object):
+    """Asynchronous iterator over a scroll search."""
+
+    def __init__(self, search):
+        """Initialize iterator."""
+        self._search = search
+        self._es = connections.get_connection(search._using)
+        self._params = dict(search._params)
+        self._scroll = self._params.pop('scroll', '5m')
+        self._hits = deque()
+        self._scroll_id = None
+        self._done = False
+
+    def __aiter__(self):
+        """Return the iterator itself."""
+        return self
+
+    async def __anext__(self):
+        """Return the next document, fetching the next batch if needed."""
+        while not self._hits:
+            if self._done:
+                raise StopAsyncIteration
+            await self._fetch()
+        return self._search._get_result(self._hits.popleft())
+
+    async def _fetch(self):
+        """Fetch the next batch of documents."""
+        if self._scroll_id is None:
+            body = self._search.to_dict()
+            if not self._params.pop('preserve_order', False):
+                body['sort'] = '_doc'
+            response = await self._es.search(
+                index=self._search._index,
+                doc_type=self._search._get_doc_type(),
+                body=body,
+                scroll=self._scroll,
+                **self._params
+            )
+        else:
+            response = await self._es.scroll(
+                scroll_id=self._scroll_id, scroll=self._scroll)
+        self._scroll_id = response.get('_scroll_id')
+        self._hits.extend(response['hits']['hits'])
+        if not response['hits']['hits']:
+            self._done = True
+            if self._scroll_id:
+                await self._es.clear_scroll(
+                    body={'scroll_id': [self._scroll_id]}, ignore=(404, ))
+
+
+async def create(ignore=None, state=None):
+    """Create the registered indices concurrently and put their aliases.
+
+    :param ignore: List of HTTP status codes to ignore.
+    :param state: Search state (default: ``current_search``).
+    :returns: List of tuples with index or alias name and response.
+    """
+    state = state or current_search._get_current_object()
+    client = state.async_client
+    ignore = ignore or []
+
+    indices = list(_get_index_files(state.active_aliases))
+    responses = await asyncio.gather(*[
+        client.indices.create(
+            index=name,
+            body=state._load_json(filename),
+            ignore=ignore,
+        ) for name, filename in indices
+    ])
+    result = list(zip([name for name, filename in indices], responses))
+    result.extend(await _update_aliases(
+        state, 'add', _get_aliases(state.active_aliases), ignore))
+    return result
+
+
+async def delete(ignore=None, state=None):
+    """Remove the aliases and delete the registered indices concurrently.
+
+    The indices behind registered names which became aliases (see
+    ``current_search.reindex``) are looked up with the synchronous client.
+
+    :param ignore: List of HTTP status codes to ignore.
+    :param state: Search state (default: ``current_search``).
+    :returns: List of tuples with index or alias name and response.
+    """
+    state = state or current_search._get_current_object()
+    client = state.async_client
+    ignore = ignore or []
+
+    aliases, indices = state._plan_delete()
+    result = await _update_aliases(state, 'remove', aliases, ignore)
+    responses = await asyncio.gather(*[
+        client.indices.delete(index=','.join(concrete), ignore=ignore)
+        for name, concrete in indices
+    ])
+    result.extend(zip([name for name, concrete in indices], responses))
+    return result
+
+
+async def put_templates(ignore=None, state=None):
+    """Put the registered templates concurrently.
+
+    :param ignore: List of HTTP status codes to ignore.
+    :param state: Search state (default: ``current_search``).
+    :returns: List of tuples with template filename and response.
+    """
+    state = state or current_search._get_current_object()
+    client = state.async_client
+    ignore = ignore or []
+
+    templates = list(state.templates)
+    responses = await asyncio.gather(*[
+        client.indices.put_template(
+            name=template,
+            body=state.get_template_body(template),
+            ignore=ignore,
+        ) for template in templates
+    ])
+    return list(zip([state.templates[t] for t in templates], responses))
+
+
+async def close(state=None):
+    """Close the asynchronous clients of the current event loop.
+
+    :param state: Search state (default: ``current_search``).
+    """
+    state = state or current_search._get_current_object()
+    with state._clients_lock:
+        clients = state._async_clients.pop(asyncio.get_event_loop(), {})
+    for client in clients.values():
+        await client.transport.close()
+
+
+async def _update_aliases(state, action, aliases, ignore):
+    """Send alias actions, see ``current_search.update_aliases``."""
+    result = []
+    for names, actions in state._alias_actions(action, aliases):
+        response = None
+        if actions:
+            response = await state.async_client.indices.update_aliases(
+                body={'actions': actions},
+                ignore=ignore,
+            )
+        result.extend((name, response) for name in names)
+    return result
@@ -9,24 +9,49 @@
 """Search engine API."""
 
 import hashlib
+import json
+import threading
+import zlib
 from functools import partial
+from itertools import islice
 
 from elasticsearch import VERSION as ES_VERSION
+from elasticsearch.exceptions import TransportError
 from elasticsearch_dsl import FacetedSearch, Search
+from elasticsearch_dsl.connections import connections
 from elasticsearch_dsl.faceted_search import FacetedResponse
 from elasticsearch_dsl.query import Bool, Ids
-from flask import request
+from flask import current_app, g, has_app_context, request, session
+from werkzeug.local import LocalProxy
+from werkzeug.utils import import_string
 
-from .proxies import current_search_client
+from .proxies import current_search, current_search_client, \
+    current_search_clients
+from .utils import LRUCache, decode_cursor, encode_cursor, parallel_map
+
+try:
+    from queue import Full, Queue
+except ImportError:
+    from Queue import Full, Queue
 
 
 class DefaultFilter(object):
-    """Shortcut for defining default filters with query parser."""
+    """Shortcut for defining default filters with query parser.
+
+    The parsed queries are cached, keyed by the query (e.g. a query string
+    computed for the current user), unless the query is not hashable.
+    """
+
+    def __init__(self, query=None, query_parser=None, cache_size=128):
+        """Build filter property with query parser.
 
-    def __init__(self, query=None, query_parser=None):
-        """Build filter property with query parser."""
+        :param query: The query or a callable returning it.
+        :param query_parser: Callable parsing the query.
+        :param cache_size: Maximum number of cached parsed queries.
+        """
         self._query = query
         self.query_parser = query_parser or (lambda x: x)
+        self._cache = LRUCache(maxsize=cache_size) if query_parser else None
 
     @property
     def query(self):
@@ -35,7 +60,40 @@ class DefaultFilter(object):
 
     def __get__(self, obj, objtype):
         """Return parsed query."""
-        return self.query_parser(self.query)
+        query = self.query
+        if self._cache is None:
+            return self.query_parser(query)
+        try:
+            parsed = self._cache.get(query)
+        except TypeError:
+            return self.query_parser(query)
+        if parsed is None:
+            parsed = self.query_parser(query)
+            self._cache.set(query, parsed)
+        # Callers may modify the query.
+        return parsed._clone() if hasattr(parsed, '_clone') else parsed
+
+
+def _get_filtered_values(query, field):
+    """Return the values of a field required by a ``term(s)`` query.
+
+    :param query: The query as a dictionary.
+    :param field: The field.
+    :returns: List of values or ``None``.
+    """
+    if 'term' in query and field in query['term']:
+        value = query['term'][field]
+        return [value['value'] if isinstance(value, dict) else value]
+    if 'terms' in query and isinstance(query['terms'].get(field), list):
+        return query['terms'][field] or None
+    if 'bool' in query:
+        for occur in ('filter', 'must'):
+            clauses = query['bool'].get(occur, [])
+            for clause in clauses if isinstance(clauses, list) \
+                    else [clauses]:
+                values = _get_filtered_values(clause, field)
+                if values:
+                    return values
 
 
 class MinShouldMatch(str):
@@ -75,17 +133,39 @@ class RecordsSearch(Search):
         fields = ('*', )
         facets = {}
 
+        client_name = None
+        """Name of the client used to execute the search.
+
+        See ``SEARCH_CLIENTS``. The default client is used if not set.
+        """
+
         default_filter = None
         """Default filter added to search body.
 
         Example: ``default_filter = DefaultFilter('_access.owner:"1"')``.
         """
 
+        cache_ttl = None
+        """Number of seconds the responses of the searches are cached.
+
+        Responses are not cached if not set. See ``SEARCH_RESULTS_CACHE``.
+        """
+
+        sort_tiebreaker = None
+        """Unique field added to the sort of paginated searches.
+
+        See :meth:`RecordsSearch.after`. Defaults to ``_id`` (``_uid`` before
+        Elasticsearch 6).
+        """
+
     def __init__(self, **kwargs):
         """Use Meta to set kwargs defaults."""
         kwargs.setdefault('index', getattr(self.Meta, 'index', None))
         kwargs.setdefault('doc_type', getattr(self.Meta, 'doc_types', None))
-        kwargs.setdefault('using', current_search_client)
+        client_name = getattr(self.Meta, 'client_name', None)
+        kwargs.setdefault('using', LocalProxy(
+            lambda: current_search_clients[client_name])
+            if client_name else current_search_client)
 
         super(RecordsSearch, self).__init__(**kwargs)
 
@@ -95,6 +175,126 @@ class RecordsSearch(Search):
             self.query = Bool(minimum_should_match=MinShouldMatch("0<1"),
                               filter=default_filter)
 
+    def _get_doc_type(self):
+        """Return the ``doc_type`` parameter of search requests."""
+        parent = getattr(super(RecordsSearch, self), '_get_doc_type', None)
+        return parent() if parent else self._doc_type
+
+    def _get_result(self, hit, parent_class=None):
+        """Return the result object of a raw hit."""
+        parent = getattr(super(RecordsSearch, self), '_get_result', None)
+        if parent:
+            return parent(hit, parent_class)
+        from elasticsearch_dsl.response import Hit
+        callback = self._doc_type_map.get(hit.get('_type'), Hit)
+        return getattr(callback, 'from_es', callback)(hit)
+
+    def _make_response(self, raw):
+        """Return the response object of a raw search response."""
+        if ES_VERSION[0] > 2:
+            return self._response_class(self, raw)
+        return self._response_class(raw, callbacks=self._doc_type_map)
+
+    def _get_client(self):
+        """Return the client used by the search."""
+        client = connections.get_connection(self._using)
+        if isinstance(client, LocalProxy):
+            return client._get_current_object()
+        return client
+
+    def execute(self, ignore_cache=False):
+        """Execute the search and return the response.
+
+        If ``Meta.cache_ttl`` is set, raw responses are kept in the results
+        cache and shared by identical searches until they expire or the
+        searched indices are invalidated (see
+        ``current_search.invalidate_cache``). The
+        ``preference`` parameter is not part of the cache key.
+
+        :param ignore_cache: Execute the search even if its response is
+            cached, and cache the new response.
+        """
+        self._apply_routing()
+        ttl = getattr(self.Meta, 'cache_ttl', None)
+        if not ttl or (not ignore_cache and hasattr(self, '_response')):
+            return super(RecordsSearch, self).execute(
+                ignore_cache=ignore_cache)
+
+        cache = current_search.results_cache
+        key = self._results_cache_key()
+        raw = None if ignore_cache else cache.get(key)
+        if raw is None:
+            raw = self._get_client().search(
+                index=self._index,
+                doc_type=self._get_doc_type(),
+                body=self.to_dict(),
+                **self._params
+            )
+            cache.set(key, raw, timeout=ttl)
+        self._response = self._make_response(raw)
+        return self._response
+
+    def _results_cache_key(self):
+        """Return the key of the search in the results cache."""
+        indices = self._index or ['_all']
+        payload = json.dumps([
+            getattr(self.Meta, 'client_name', None),
+            indices,
+            self._get_doc_type(),
+            self.to_dict(),
+            dict((key, value) for key, value in self._params.items()
+                 if key != 'preference'),
+            current_search.cache_generations(indices),
+        ], sort_keys=True, default=str)
+        return 'invenio-search:results:{0}'.format(
+            hashlib.sha1(payload.encode('utf8')).hexdigest())
+
+    def scan(self):
+        """Iterate over all the documents matching the search."""
+        self._apply_routing()
+        return super(RecordsSearch, self).scan()
+
+    def count(self):
+        """Return the number of hits matching the search."""
+        self._apply_routing()
+        return super(RecordsSearch, self).count()
+
+    def _apply_routing(self):
+        """Set the routing of the search from the registered routing field.
+
+        The routing is only set if the query filters on values of the routing
+        field of the searched indices (see
+        ``current_search.register_routing``).
+        """
+        if 'routing' in self._params or not has_app_context():
+            return
+        fields = set(current_search.get_routing_field(index)
+                     for index in self._index or ['_all'])
+        field = fields.pop() if len(fields) == 1 else None
+        if not field:
+            return
+        values = _get_filtered_values(self.to_dict().get('query', {}), field)
+        if values:
+            self._params = dict(
+                self._params, routing=','.join(str(v) for v in values))
+
+    def execute_deferred(self):
+        """Add the search to a batch and return its response lazily.
+
+        The searches deferred within the same application context (and using
+        the same client) are sent in a single ``_msearch`` request, the first
+        time one of their responses is accessed (see
+        :class:`RecordsMultiSearch`).
+
+        :returns: A proxy to the response of the search.
+        """
+        client = self._get_client()
+        batches = g.setdefault('_invenio_search_batches', {})
+        batch = batches.get(id(client))
+        if batch is None or batch.executed:
+            batch = batches[id(client)] = RecordsMultiSearch(using=client)
+        return LocalProxy(partial(batch.get_response, batch.add(self)))
+
     def get_record(self, id_):
         """Return a record by its identifier.
 
@@ -111,6 +311,249 @@ class RecordsSearch(Search):
         """
         return self.query(Ids(values=[str(id_) for id_ in ids]))
 
+    mget_params = ('preference', 'routing', 'realtime', 'refresh')
+    """Search parameters passed to multi-get requests."""
+
+    def mget(self, ids):
+        """Return records by their identifiers, in the same order.
+
+        The records are fetched with a multi-get request, which is routed
+        directly to the shards holding them and does not wait for a refresh.
+        A multi-get request can not apply a query, thus the records are
+        searched instead (see :meth:`get_records`) if the search has a query,
+        a filter (e.g. ``Meta.default_filter``) or other options such as
+        source filtering, if it does not target
+        a single index or alias, or if the index has a registered routing
+        field and the search has no ``routing`` parameter.
+
+        :param ids: A list of record identifiers.
+        :returns: A list of records, missing ones are skipped.
+        """
+        ids = [str(id_) for id_ in ids]
+        if not ids:
+            return []
+
+        if self._can_mget():
+            params = dict(
+                (key, value) for key, value in self._params.items()
+                if key in self.mget_params
+            )
+            doc_type = self._get_doc_type()
+            if doc_type and len(doc_type) == 1:
+                params['doc_type'] = doc_type[0]
+            try:
+                response = self._get_client().mget(
+                    index=self._index[0], body={'ids': ids}, **params)
+            except TransportError as e:
+                # E.g. an alias pointing to several indices.
+                if e.status_code != 400:
+                    raise
+            else:
+                return [self._get_result(doc) for doc in response['docs']
+                        if doc.get('found')]
+
+        hits = dict(
+            (hit.meta.id, hit)
+            for hit in self.get_records(ids)[:len(ids)].execute()
+        )
+        return [hits[id_] for id_ in ids if id_ in hits]
+
+    def iter_records(self, ids, chunk_size=500, workers=None, ordered=True):
+        """Yield records by their identifiers, fetched in chunks.
+
+        The identifiers are consumed lazily and split into chunks fetched
+        with :meth:`mget`, so that very long lists of identifiers neither
+        exceed the limits of a single search nor build huge requests.
+
+        :param ids: An iterable of record identifiers.
+        :param chunk_size: Number of records fetched by one request.
+        :param workers: Number of chunks fetched in parallel (default: fetch
+            them one by one).
+        :param ordered: Yield the records in the order of the identifiers,
+            otherwise as soon as their chunk is fetched.
+        """
+        ids = iter(ids)
+        search = self.using(self._get_client())
+        app = current_app._get_current_object() if has_app_context() \
+            else None
+
+        def _chunks():
+            while True:
+                chunk = list(islice(ids, chunk_size))
+                if not chunk:
+                    return
+                yield chunk
+
+        def _fetch(chunk):
+            if app is None:
+                return search.mget(chunk)
+            with app.app_context():
+                return search.mget(chunk)
+
+        for records in parallel_map(_fetch, _chunks(), workers=workers,
+                                    ordered=ordered):
+            for record in records:
+                yield record
+
+    def _can_mget(self):
+        """Check if the search can be executed as a multi-get request."""
+        index = self._index or []
+        if len(index) != 1 or index[0] == '_all' or \
+                any(c in index[0] for c in '*,'):
+            return False
+        # Routed documents are not on the shard of their identifier.
+        if 'routing' not in self._params and has_app_context() and \
+                current_search.get_routing_field(index[0]):
+            return False
+        body = self.to_dict()
+        # Anything else, e.g. source filtering or stored fields, can not be
+        # applied by a multi-get request. Records are returned in the order
+        # of their identifiers whatever the sort is.
+        if set(body) - set(['query', 'size', 'from', 'sort']):
+            return False
+        return body.get('query', {'match_all': {}}) == {'match_all': {}}
+
+    def after(self, cursor=None):
+        """Return the search for the page following a cursor.
+
+        Contrary to ``from``/``size`` pagination, the cost of a page does not
+        depend on its depth and pages are not limited by
+        ``index.max_result_window``. Requires Elasticsearch 5 or later.
+
+        .. code-block:: python
+
+            search = RecordsSearch().after(request.args.get('cursor'))[:20]
+            response = search.execute()
+            cursor = search.next_cursor(response)
+
+        The sort of the search is made stable by adding the
+        ``Meta.sort_tiebreaker`` field.
+
+        :param cursor: Cursor returned by :meth:`next_cursor` (default: first
+            page).
+        :raises ValueError: If the cursor is invalid.
+        """
+        tiebreaker = getattr(self.Meta, 'sort_tiebreaker', None) or \
+            ('_uid' if ES_VERSION[0] < 6 else '_id')
+        sort = list(self._sort) or ['_score']
+        fields = [next(iter(field)) if isinstance(field, dict) else field
+                  for field in sort]
+        if tiebreaker not in fields:
+            sort.append(tiebreaker)
+
+        search = self.sort(*sort)
+        search._extra.pop('from', None)
+        if cursor:
+            search._extra['search_after'] = decode_cursor(cursor)
+        return search
+
+    def next_cursor(self, response):
+        """Return the cursor of the page following a response.
+
+        :param response: Response of a search returned by :meth:`after`.
+        :returns: The cursor or ``None`` if it was the last page.
+        """
+        hits = response.hits
+        if not hits or len(hits) < self._extra.get('size', 10):
+            return None
+        return encode_cursor(hits[-1].meta.sort)
+
+    def iter_hits(self, size=1000):
+        """Yield all the hits of the search, page by page.
+
+        The pages are fetched with :meth:`after`, thus the hits are yielded
+        in the order of the search.
+
+        :param size: Number of hits fetched by one request.
+        """
+        cursor = None
+        while True:
+            search = self.after(cursor).extra(size=size)
+            response = search.execute()
+            for hit in response:
+                yield hit
+            cursor = search.next_cursor(response)
+            if cursor is None:
+                return
+
+    def parallel_scan(self, slices, merge=True, buffer_size=1000):
+        """Iterate over all the matching documents with a sliced scroll.
+
+        The scroll is split into ``slices`` independent slices (ideally the
+        number of shards of the index), scrolled concurrently by one thread
+        each. Requires Elasticsearch 5 or later, otherwise a single scroll is
+        used (see ``scan``).
+
+        :param slices: Number of slices.
+        :param merge: Return a single generator over the documents of all the
+            slices, in no particular order. Otherwise return a list with one
+            generator per slice, to be consumed by the caller.
+        :param buffer_size: Maximum number of documents fetched ahead of the
+            merged generator. The slices are paused while the buffer is full.
+        """
+        search = self.using(self._get_client())
+        if slices <= 1 or ES_VERSION[0] < 5:
+            searches = [search]
+        else:
+            searches = [search.extra(slice={'id': i, 'max': slices})
+                        for i in range(slices)]
+
+        if not merge:
+            return [s.scan() for s in searches]
+        return self._merge_scans(searches, buffer_size)
+
+    @staticmethod
+    def _merge_scans(searches, buffer_size):
+        """Yield the documents of several scans scrolled by worker threads."""
+        buffer = Queue(maxsize=buffer_size)
+        stop = threading.Event()
+        done = object()
+
+        def _put(item):
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        def _scroll(search):
+            hits = search.scan()
+            try:
+                for hit in hits:
+                    if not _put((None, hit)):
+                        break
+            except Exception as e:
+                _put((e, None))
+            finally:
+                hits.close()
+                _put((None, done))
+
+        threads = [threading.Thread(target=_scroll, args=(search, ))
+                   for search in searches]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            running = len(threads)
+            while running:
+                error, hit = buffer.get()
+                if error is not None:
+                    raise error
+                if hit is done:
+                    running -= 1
+                else:
+                    yield hit
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    _faceted_search_classes = {}
+    """Faceted search classes built by :meth:`faceted_search`."""
+
     @classmethod
     def faceted_search(cls, query=None, filters=None, search=None):
         """Return faceted search instance with defaults set.
@@ -120,14 +563,36 @@ class RecordsSearch(Search):
         :param search: An instance of ``Search`` class. (default: ``cls()``).
         """
         search_ = search or cls()
+        faceted_search_class = cls._get_faceted_search_class(
+            type(search_), search_._index[0])
+        return faceted_search_class(search_, query=query,
+                                    filters=filters or {})
+
+    @staticmethod
+    def _get_faceted_search_class(search_class, index_name):
+        """Return the faceted search class of a search class and index.
+
+        The class is built once and reused by subsequent calls.
+        """
+        key = (search_class, index_name)
+        faceted_search_class = RecordsSearch._faceted_search_classes.get(key)
+        if faceted_search_class is not None:
+            return faceted_search_class
+
+        meta = search_class.Meta
 
         class RecordsFacetedSearch(FacetedSearch):
             """Pass defaults from ``cls.Meta`` object."""
 
-            index = search_._index[0]
-            doc_types = getattr(search_.Meta, 'doc_types', ['_all'])
-            fields = getattr(search_.Meta, 'fields', ('*', ))
-            facets = getattr(search_.Meta, 'facets', {})
+            index = index_name
+            doc_types = getattr(meta, 'doc_types', ['_all'])
+            fields = getattr(meta, 'fields', ('*', ))
+            facets = getattr(meta, 'facets', {})
+
+            def __init__(self, search_, **kwargs):
+                """Use ``search_`` instead of the default search."""
+                self._search_ = search_
+                super(RecordsFacetedSearch, self).__init__(**kwargs)
 
             def search(self):
                 """Use ``search`` or ``cls()`` instead of default Search."""
@@ -135,10 +600,12 @@ class RecordsSearch(Search):
                 # Elasticsearch FacetedResponse class constructor signature.
 
                 if ES_VERSION[0] > 2:
-                    return search_.response_class(FacetedResponse)
-                return search_.response_class(partial(FacetedResponse, self))
+                    return self._search_.response_class(FacetedResponse)
+                return self._search_.response_class(
+                    partial(FacetedResponse, self))
 
-        return RecordsFacetedSearch(query=query, filters=filters or {})
+        return RecordsSearch._faceted_search_classes.setdefault(
+            key, RecordsFacetedSearch)
 
     def with_preference_param(self):
         """Add the preference param to the ES request and return a new Search.
@@ -147,28 +614,148 @@ class RecordsSearch(Search):
         replicas, documented on ES documentation.
         See: https://www.elastic.co/guide/en/elasticsearch/guide/current
         /_search_options.html#_preference for more information.
+
+        The preference is derived from the current request by
+        ``SEARCH_PREFERENCE_STRATEGY`` and computed once per request.
         """
         user_hash = self._get_user_hash()
         if user_hash:
             return self.params(preference=user_hash)
         return self
 
-    def _get_user_agent(self):
-        """Retrieve the request's User-Agent, if available.
+    def _get_user_hash(self):
+        """Calculate a digest of the preference key of the current request."""
+        if not request:
+            return None
+        current_request = request._get_current_object()
+        user_hash = getattr(current_request, '_invenio_search_preference',
+                            None)
+        if user_hash is None:
+            strategy = current_app.config.get(
+                'SEARCH_PREFERENCE_STRATEGY') or ip_user_agent_preference
+            if not callable(strategy):
+                strategy = import_string(strategy)
+            key = strategy()
+            user_hash = '{0:08x}'.format(
+                zlib.crc32(key.encode('utf8')) & 0xffffffff) if key else ''
+            current_request._invenio_search_preference = user_hash
+        return user_hash or None
+
+
+def ip_user_agent_preference():
+    """Return the preference key of the client IP address and User-Agent."""
+    return '{ip}-{ua}'.format(ip=request.remote_addr,
+                              ua=request.headers.get('User-Agent') or '')
+
+
+def user_preference():
+    """Return the preference key of the current user.
+
+    Anonymous users fall back to :func:`ip_user_agent_preference`. Requires
+    Flask-Login.
+    """
+    from flask_login import current_user
+    if current_user and current_user.is_authenticated:
+        return 'user-{0}'.format(current_user.get_id())
+    return ip_user_agent_preference()
+
+
+def session_preference():
+    """Return the preference key of the current session.
+
+    The session identifier (``sid_s``) is provided by server-side session
+    extensions such as Flask-KVSession. Requests without session fall back
+    to :func:`ip_user_agent_preference`.
+    """
+    sid = getattr(session, 'sid_s', None)
+    if sid:
+        return 'session-{0}'.format(sid)
+    return ip_user_agent_preference()
+
+
+class RecordsMultiSearch(object):
+    """Execute several searches in a single ``_msearch`` request.
 
-        Taken from Flask Login utils.py.
+    Contrary to ``elasticsearch_dsl.MultiSearch``, the request parameters of
+    each search (e.g. the preference set by
+    :meth:`RecordsSearch.with_preference_param`) are sent along with it.
+
+    .. code-block:: python
+
+        batch = RecordsMultiSearch()
+        batch.add(RecordsSearch(index='records'))
+        batch.add(RecordsSearch(index='authors').with_preference_param())
+        records, authors = batch.execute()
+    """
+
+    header_params = ('preference', 'routing', 'search_type', 'request_cache')
+    """Search parameters supported in the ``_msearch`` headers."""
+
+    def __init__(self, using=None):
+        """Initialize an empty batch.
+
+        :param using: Client (default: the client of the first search).
         """
-        user_agent = request.headers.get('User-Agent')
-        if user_agent:
-            user_agent = user_agent.encode('utf-8')
-        return user_agent or ''
+        self._using = using
+        self._searches = []
+        self._responses = None
 
-    def _get_user_hash(self):
-        """Calculate a digest based on request's User-Agent and IP address."""
-        if request:
-            user_hash = '{ip}-{ua}'.format(ip=request.remote_addr,
-                                           ua=self._get_user_agent())
-            alg = hashlib.md5()
-            alg.update(user_hash.encode('utf8'))
-            return alg.hexdigest()
-        return None
+    @property
+    def executed(self):
+        """Check if the batch was executed."""
+        return self._responses is not None
+
+    def add(self, search):
+        """Add a search to the batch.
+
+        :param search: A :class:`RecordsSearch` instance.
+        :returns: Position of the search in the batch.
+        """
+        self._searches.append(search)
+        self._responses = None
+        return len(self._searches) - 1
+
+    def execute(self, raise_on_error=True):
+        """Execute the searches and return their responses.
+
+        :param raise_on_error: Raise an exception if a search failed,
+            otherwise its response is ``None``.
+        """
+        if self._responses is None:
+            body = []
+            for search in self._searches:
+                search._apply_routing()
+                header = dict(
+                    (key, value) for key, value in search._params.items()
+                    if key in self.header_params
+                )
+                if search._index:
+                    header['index'] = search._index
+                doc_type = search._get_doc_type()
+                if doc_type:
+                    header['type'] = doc_type
+                body.extend([header, search.to_dict()])
+
+            client = self._using or self._searches[0]._get_client()
+            responses = client.msearch(body=body)['responses'] \
+                if body else []
+
+            result = []
+            for search, raw in zip(self._searches, responses):
+                if raw.get('error'):
+                    if raise_on_error:
+                        raise TransportError(
+                            'N/A', raw['error']['type'], raw['error'])
+                    response = None
+                else:
+                    response = search._response = search._make_response(raw)
+                result.append(response)
+            self._responses = result
+        return self._responses
+
+    def get_response(self, position):
+        """Return the response of a search, executing the batch if needed.
+
+        :param position: Position of the search returned by :meth:`add`.
+        """
+        return self.execute()[position]
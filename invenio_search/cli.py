@@ -12,12 +12,14 @@ from __future__ import absolute_import, print_function
 
 import json
 import sys
+import time
 from functools import wraps
 
 import click
-from elasticsearch import VERSION as ES_VERSION
+from flask import current_app
 from flask.cli import with_appcontext
 
+from .errors import RolloverAliasNotConfigured, RolloverNotSupported
 from .proxies import current_search, current_search_client
 
 
@@ -31,6 +33,8 @@ def es_version_check(f):
     """Decorator to check Elasticsearch version."""
     @wraps(f)
     def inner(*args, **kwargs):
+        from elasticsearch import VERSION as ES_VERSION
+
         cluster_ver = current_search.cluster_version[0]
         client_ver = ES_VERSION[0]
         if cluster_ver != client_ver:
@@ -62,23 +66,51 @@ def check():
 
 
 @index.command()
-@click.option('--force', is_flag=True, default=False)
+@click.option('--force', is_flag=True, default=False,
+              help='Skip the existing indexes and aliases.')
+@click.option('-w', '--workers', type=int, default=1,
+              help='Number of indexes created in parallel.')
+@click.option('--dry-run', is_flag=True, default=False,
+              help='Only show the missing indexes and aliases, and the '
+              'differences of the existing mappings.')
 @with_appcontext
 @es_version_check
-def init(force):
+def init(force, workers, dry_run):
     """Initialize registered aliases and mappings."""
+    if dry_run:
+        existing = current_search.get_existing_indices()
+        for name, status, diff in current_search.diff_mappings(existing):
+            if status == 'changed':
+                click.secho('Mapping of {0} differs:'.format(name),
+                            fg='yellow', file=sys.stderr)
+                click.echo('\n'.join(diff))
+        indices, aliases = current_search.plan_create(existing)
+        for name in indices:
+            click.echo('Would create index {0}.'.format(name))
+        for alias, alias_indices in aliases:
+            click.echo('Would add alias {0} to {1}.'.format(
+                alias, ', '.join(alias_indices)))
+        return
+
     click.secho('Creating indexes...', fg='green', bold=True, file=sys.stderr)
     with click.progressbar(
-            current_search.create(ignore=[400] if force else None),
+            current_search.create(ignore=[400] if force else None,
+                                  workers=workers, skip_existing=force),
             length=current_search.number_of_indexes) as bar:
         for name, response in bar:
             bar.label = name
     click.secho('Putting templates...', fg='green', bold=True, file=sys.stderr)
+    statuses = {'created': 0, 'updated': 0, 'skipped': 0}
     with click.progressbar(
-            current_search.put_templates(ignore=[400] if force else None),
+            current_search.sync_templates(ignore=[400] if force else None,
+                                          workers=workers),
             length=len(current_search.templates.keys())) as bar:
-        for response in bar:
-            bar.label = response
+        for name, status, response in bar:
+            bar.label = name
+            statuses[status] += 1
+    click.secho('Templates: {created} created, {updated} updated, '
+                '{skipped} unchanged.'.format(**statuses), fg='green',
+                file=sys.stderr)
 
 
 @index.command()
@@ -116,6 +148,83 @@ def create(index_name, body, force, verbose):
         click.echo(json.dumps(result))
 
 
+@index.command()
+@click.argument('index_name')
+@click.option('-s', '--source', default=None)
+@click.option('--suffix', default=None)
+@click.option('--delete-old', is_flag=True, default=False)
+@click.option('--size', type=int, default=1000,
+              help='Number of documents copied per batch.')
+@click.option('--slices', type=int, default=None)
+@click.option('--requests-per-second', type=float, default=None)
+@click.option('--timeout', type=int, default=None,
+              help='Timeout in seconds of the requests submitting and '
+                   'polling the copy.')
+@click.option('--verbose', is_flag=True, default=False)
+@with_appcontext
+@es_version_check
+def reindex(index_name, source, suffix, delete_old, size, slices,
+            requests_per_second, timeout, verbose):
+    """Reindex a registered index and switch its aliases."""
+    for step, result in current_search.reindex(
+            index_name, source=source, suffix=suffix, delete_old=delete_old,
+            size=size, slices=slices, requests_per_second=requests_per_second,
+            request_timeout=timeout):
+        click.secho('Step {0} done.'.format(step), fg='green',
+                    file=sys.stderr)
+        if verbose:
+            click.echo(json.dumps(result))
+
+
+@index.command()
+@click.argument('aliases', nargs=-1)
+@click.option('--dry-run', is_flag=True, default=False)
+@click.option('--verbose', is_flag=True, default=False)
+@with_appcontext
+@es_version_check
+def rollover(aliases, dry_run, verbose):
+    """Roll over write aliases of time-based indices.
+
+    Rolls over the given aliases (default: all the aliases configured in
+    SEARCH_ROLLOVER_ALIASES) and applies their retention. Meant to be run
+    periodically.
+    """
+    try:
+        for step, name, result in current_search.rollover(
+                aliases, dry_run=dry_run):
+            if step != 'rollover':
+                message = '{0} {1}{2}.'.format(
+                    step.capitalize(), name, ' (dry run)' if dry_run else '')
+            elif result.get('rolled_over'):
+                message = 'Alias {0} rolled over to {1}.'.format(
+                    name, result['new_index'])
+            elif dry_run and any(result.get('conditions', {}).values()):
+                message = 'Alias {0} would roll over to {1}.'.format(
+                    name, result['new_index'])
+            else:
+                message = 'Alias {0} does not need a rollover.'.format(name)
+            click.secho(message, fg='green', file=sys.stderr)
+            if verbose and result is not None:
+                click.echo(json.dumps(result))
+    except (RolloverAliasNotConfigured, RolloverNotSupported) as e:
+        raise click.UsageError(e.args[0])
+
+
+@index.command()
+@click.option('-o', '--output', type=click.Path(dir_okay=False),
+              default=None)
+@with_appcontext
+def manifest(output):
+    """Write the manifest of registered mappings and templates."""
+    output = output or current_app.config.get('SEARCH_REGISTRY_MANIFEST')
+    if not output:
+        raise click.UsageError(
+            'Provide the --output option or set SEARCH_REGISTRY_MANIFEST.')
+    current_search.write_manifest(output)
+    click.secho('Manifest written to {0}.'.format(output), fg='green',
+                file=sys.stderr)
+
+
 @index.command('list')
 @click.option('-a', '--only-active', is_flag=True, default=False)
 @click.option('--only-aliases', is_flag=True, default=False)
@@ -183,12 +292,90 @@ def delete(index_name, force, verbose):
 @es_version_check
 def put(index_name, doc_type, identifier, body, force, verbose):
     """Index input data."""
+    document = json.load(body)
     result = current_search_client.index(
         index=index_name,
         doc_type=doc_type or index_name,
         id=identifier,
-        body=json.load(body),
+        body=document,
         op_type='index' if force or identifier is None else 'create',
+        routing=current_search.get_routing(index_name, document),
     )
     if verbose:
         click.echo(json.dumps(result))
+
+
+@index.command()
+@click.argument('index_name')
+@click.argument('doc_type')
+@click.argument('files', nargs=-1, type=click.File('r'))
+@click.option('--chunk-size', type=int, default=500)
+@click.option('--max-chunk-bytes', type=int, default=10485760)
+@click.option('-w', '--workers', type=int, default=1)
+@click.option('--max-retries', type=int, default=3)
+@click.option('--force', is_flag=True, default=False)
+@click.option('--verbose', is_flag=True, default=False)
+@with_appcontext
+@es_version_check
+def bulk(index_name, doc_type, files, chunk_size, max_chunk_bytes, workers,
+         max_retries, force, verbose):
+    """Index JSON lines input data.
+
+    Documents are read line by line from the given files (or from the
+    standard input). A document ``_id`` key is used as its identifier.
+    Malformed lines are reported and counted as failed documents.
+    """
+    invalid = []
+
+    def _actions():
+        for fp in files or (click.get_text_stream('stdin'), ):
+            for number, line in enumerate(fp, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    doc = json.loads(line)
+                    if not isinstance(doc, dict):
+                        raise ValueError('Not a JSON object')
+                except ValueError as e:
+                    invalid.append(line)
+                    click.echo(json.dumps({
+                        'error': 'Invalid line {0} of {1}: {2}'.format(
+                            number, getattr(fp, 'name', '<stdin>'), e),
+                    }), err=True)
+                    continue
+                identifier = doc.pop('_id', None)
+                action = {
+                    '_index': index_name,
+                    '_type': doc_type or index_name,
+                    '_op_type': 'index' if force or identifier is None
+                    else 'create',
+                    '_source': doc,
+                }
+                if identifier is not None:
+                    action['_id'] = identifier
+                yield action
+
+    start = time.time()
+    success, failed = 0, 0
+    for ok, result in current_search.bulk(
+            _actions(), chunk_size=chunk_size,
+            max_chunk_bytes=max_chunk_bytes, workers=workers,
+            max_retries=max_retries):
+        if ok:
+            success += 1
+        else:
+            failed += 1
+        if verbose or not ok:
+            click.echo(json.dumps(result), err=not ok)
+    elapsed = time.time() - start
+    failed += len(invalid)
+
+    click.secho(
+        'Indexed {0} documents ({1} failed) in {2:.1f}s '
+        '({3:.0f} documents/s).'.format(
+            success, failed, elapsed, (success + failed) / (elapsed or 1)),
+        fg='red' if failed else 'green', file=sys.stderr)
+    if failed:
+        raise click.ClickException(
+            '{0} documents could not be indexed.'.format(failed))
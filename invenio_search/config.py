@@ -40,6 +40,64 @@ the different nodes. Please see
 for further details.
 """
 
+SEARCH_CLIENT_CONFIG = dict(
+    connection_class='elasticsearch.connection.Urllib3HttpConnection',
+    maxsize=25,
+    timeout=10,
+    max_retries=3,
+)
+"""Parameters of the Elasticsearch client.
+
+The dictionary is passed to ``elasticsearch.Elasticsearch``, which forwards
+the parameters to the transport and to each connection. The
+``connection_class`` can be given as a class or as an import string. By
+default the urllib3 based connection keeps up to 25 connections per host
+(``maxsize``), so that concurrent searches of a process (e.g. threads of a
+web server or parallel bulk requests) do not queue for a connection. Without
+``connection_class``, the ``RequestsHttpConnection`` is used, which ignores
+``maxsize``. Below is an example with a larger connection pool, compressed
+requests and sniffing of the cluster nodes:
+
+.. code-block:: python
+
+    SEARCH_CLIENT_CONFIG = dict(
+        connection_class='elasticsearch.connection.Urllib3HttpConnection',
+        maxsize=50,
+        http_compress=True,
+        timeout=30,
+        max_retries=3,
+        sniff_on_start=True,
+        sniff_on_connection_fail=True,
+        sniffer_timeout=60,
+    )
+
+Note that ``http_compress`` requires ``elasticsearch>=6.3``. The hosts are
+taken from ``SEARCH_ELASTIC_HOSTS`` unless ``hosts`` is given. HTTPS hosts are
+verified against ``ca_certs`` (default: the ``certifi`` bundle, if
+installed).
+
+Requests which time out are not retried unless ``retry_on_timeout=True`` is
+given. Only enable it if the slow requests are safe to send twice, as e.g. a
+retried bulk or reindex request runs again on the cluster.
+"""
+
+SEARCH_CLIENTS = {}
+"""Named client profiles.
+
+Each profile is a dictionary of client parameters which override the ones of
+``SEARCH_CLIENT_CONFIG``. The ``default`` profile is used by
+``current_search_client``, the other ones can be retrieved with
+``current_search_clients[name]`` or selected in a search class with
+``Meta.client_name``. For example, to send analytics queries to a separate
+cluster:
+
+.. code-block:: python
+
+    SEARCH_CLIENTS = {
+        'analytics': dict(hosts=['analytics-node1', 'analytics-node2']),
+    }
+"""
+
 SEARCH_MAPPINGS = None  # loads all mappings and creates aliases for them
 """List of aliases for which, their search mappings should be created.
 
@@ -64,3 +122,73 @@ and their mappings for `authors`:
     # and in your config.py
     SEARCH_MAPPINGS = ['records']
 """
+
+SEARCH_ALIASES_CHUNK_SIZE = None
+"""Maximum number of alias actions sent in one ``_aliases`` request.
+
+Aliases are created and removed through the ``_aliases`` API. By default all
+actions are sent in a single request, which makes the change atomic. Set a
+number to split very large alias trees into several requests.
+"""
+
+SEARCH_REGISTRY_MANIFEST = None
+"""Path of the manifest of registered mappings and templates.
+
+Registering mappings and templates from entry points requires walking the
+resources of all the packages on every application start. The manifest,
+written by ``flask index manifest``, records the result so that it can be
+loaded instead. It is ignored, and the packages are walked as usual, when the
+installed distributions providing the entry points change. Rebuild it after
+adding mappings or templates to packages installed in development mode.
+"""
+
+SEARCH_RESULTS_CACHE = None
+"""Factory of the backend of the search results cache.
+
+Results are only cached for search classes setting ``Meta.cache_ttl``. The
+value is a callable (or its import string) receiving the application and
+returning an object with the ``get``, ``set``, ``inc`` and ``delete`` methods
+of Flask-Caching backends, e.g. a Redis cache shared by all the processes.
+By default an in-process :class:`invenio_search.utils.LRUCache` of
+``SEARCH_RESULTS_CACHE_SIZE`` entries is used.
+"""
+
+SEARCH_RESULTS_CACHE_SIZE = 1000
+"""Maximum number of results kept by the default in-process cache."""
+
+SEARCH_PREFERENCE_STRATEGY = 'invenio_search.api:ip_user_agent_preference'
+"""Function (or its import string) returning the preference key of a request.
+
+The ``preference`` parameter set by
+:meth:`invenio_search.api.RecordsSearch.with_preference_param` is a hash of
+this key, so that the searches of a user hit the same shard copies. Return
+``None`` to not set it. Built-in strategies:
+
+- :func:`invenio_search.api.ip_user_agent_preference`: client IP address and
+  User-Agent.
+- :func:`invenio_search.api.user_preference`: authenticated user.
+- :func:`invenio_search.api.session_preference`: session identifier.
+"""
+
+SEARCH_ROLLOVER_ALIASES = {}
+"""Write aliases of time-based indices rolled over by ``index rollover``.
+
+Each alias points to the latest generation of its indices
+(``<alias>-000001``, ``<alias>-000002``, ...), which must be covered by a
+registered template. Example:
+
+.. code-block:: python
+
+    SEARCH_ROLLOVER_ALIASES = {
+        'events-stats-file-download': {
+            # Conditions of the ``_rollover`` API.
+            'conditions': {'max_age': '30d', 'max_docs': 10000000},
+            # Delete the older generations (default: keep all).
+            'max_generations': 12,
+            # Force merge generations once rolled over (default: True).
+            'forcemerge': True,
+            # Timeout in seconds of the force merge (default: 3600).
+            'forcemerge_timeout': 3600,
+        },
+    }
+"""
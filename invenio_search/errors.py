@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2018 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+"""Errors for Invenio-Search."""
+
+from __future__ import absolute_import, print_function
+
+
+class RolloverAliasNotConfigured(KeyError):
+    """Alias missing from ``SEARCH_ROLLOVER_ALIASES``."""
+
+    def __init__(self, alias):
+        """Initialize the error with the name of the alias."""
+        super(RolloverAliasNotConfigured, self).__init__(
+            'Rollover alias {0} is not configured.'.format(alias))
+        self.alias = alias
+
+
+class RolloverNotSupported(RuntimeError):
+    """Rollover requested with a client older than Elasticsearch 5."""
+
+    def __init__(self, version):
+        """Initialize the error with the major version of the client."""
+        super(RolloverNotSupported, self).__init__(
+            'Rollover requires Elasticsearch 5 or later, the client supports '
+            'Elasticsearch {0}.'.format(version))
+        self.version = version
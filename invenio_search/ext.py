@@ -9,20 +9,25 @@
 
 from __future__ import absolute_import, print_function
 
+import difflib
 import errno
 import json
 import os
+import re
+import threading
+import time
 import warnings
+from datetime import datetime
+from weakref import WeakKeyDictionary
 
-from elasticsearch import VERSION as ES_VERSION
-from pkg_resources import iter_entry_points, resource_filename, \
-    resource_isdir, resource_listdir
 from werkzeug.utils import cached_property, import_string
 
 from . import config
+from ._compat import es_major_version, iter_entry_points, resource_filename, \
+    resource_isdir, resource_listdir
 from .cli import index as index_cmd
-from .proxies import current_search_client
-from .utils import build_index_name
+from .errors import RolloverAliasNotConfigured, RolloverNotSupported
+from .utils import JSONFileCache, LRUCache, build_index_name, parallel_map
 
 
 def _get_indices(tree_or_filename):
@@ -34,6 +39,87 @@ def _get_indices(tree_or_filename):
             yield name
 
 
+def _get_index_files(tree_or_filename):
+    """Yield tuples with index name and mapping filename by walking DFS."""
+    for name, value in tree_or_filename.items():
+        if isinstance(value, dict):
+            for result in _get_index_files(value):
+                yield result
+        else:
+            yield name, value
+
+
+def _get_aliases(tree_or_filename):
+    """Yield tuples with alias name and its indices by walking DFS.
+
+    Nested aliases are yielded before their parents.
+    """
+    for name, value in tree_or_filename.items():
+        if isinstance(value, dict):
+            for result in _get_aliases(value):
+                yield result
+            yield name, list(_get_indices(value))
+
+
+def _stringify(value):
+    """Convert the scalar values of a JSON-like object to strings.
+
+    Elasticsearch returns some values (e.g. settings) as strings.
+    """
+    if isinstance(value, dict):
+        return dict((k, _stringify(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_stringify(v) for v in value]
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return u'{0}'.format(value)
+
+
+def _normalize_template(body):
+    """Return a template body comparable with the one returned by a cluster.
+
+    Settings are flattened into ``index.`` prefixed keys, defaults are set
+    and scalar values are converted to strings, as done by Elasticsearch.
+    """
+    def _flatten(settings, prefix=''):
+        for key, value in settings.items():
+            if isinstance(value, dict):
+                for item in _flatten(value, prefix + key + '.'):
+                    yield item
+            else:
+                yield prefix + key, value
+
+    body = dict(body)
+    if 'template' in body:
+        body['index_patterns'] = body.pop('template')
+    if not isinstance(body.get('index_patterns'), (list, tuple)):
+        body['index_patterns'] = [body.get('index_patterns')]
+    body.setdefault('order', 0)
+    for key in ('settings', 'mappings', 'aliases'):
+        body[key] = body.get(key) or {}
+    body['settings'] = dict(
+        (key if key.startswith('index.') else 'index.' + key, value)
+        for key, value in _flatten(body['settings']))
+    return _stringify(body)
+
+
+class _SearchClients(object):
+    """Mapping of the named clients of a search state."""
+
+    def __init__(self, state):
+        """Initialize mapping."""
+        self._state = state
+
+    def __getitem__(self, name):
+        """Return the named client."""
+        return self._state.get_client(name)
+
+    def __contains__(self, name):
+        """Check if a client profile is configured."""
+        return name == 'default' or \
+            name in (self._state.app.config.get('SEARCH_CLIENTS') or {})
+
+
 class _SearchState(object):
     """Store connection to elastic client and registered indexes."""
     def __init__(self,
@@ -48,14 +134,28 @@ class _SearchState(object):
             The entrypoint group name to load mappings.
         :param entry_point_group_templates:
             The entrypoint group name to load templates.
+        :param manifest: Path of a manifest file written by
+            :meth:`write_manifest` (default: ``SEARCH_REGISTRY_MANIFEST``).
         """
         self.app = app
         self.aliases = {}
         self.number_of_indexes = 0
         self._client = kwargs.get('client')
+        self._clients = {}
+        self._async_clients = WeakKeyDictionary()
+        self._clients_lock = threading.Lock()
+        self._clients_pid = os.getpid()
+        self._index_files = {}
+        self._routing = {}
+        self._routing_fields = None
+        self._json_cache = JSONFileCache()
+        self.entry_point_group_mappings = entry_point_group_mappings
         self.entry_point_group_templates = entry_point_group_templates
 
-        if entry_point_group_mappings:
+        manifest = kwargs.get(
+            'manifest', app.config.get('SEARCH_REGISTRY_MANIFEST'))
+        if not (manifest and self.load_manifest(manifest)) and \
+                entry_point_group_mappings:
             self.load_entry_point_group_mappings(entry_point_group_mappings)
 
         with app.app_context():
@@ -89,10 +189,12 @@ class _SearchState(object):
         :param alias: The alias.
         :param package_name: The package name.
         """
+        es_version = es_major_version()
+
         # For backwards compatibility, we also allow for ES2 mappings to be
         # placed at the root level of the specified package path, and not in
         # the `<package-path>/v2` directory.
-        if ES_VERSION[0] == 2:
+        if es_version == 2:
             try:
                 resource_listdir(package_name, 'v2')
                 package_name += '.v2'
@@ -107,7 +209,7 @@ class _SearchState(object):
                     "for. (e.g. '{}/v2/{}')".format(package_name, alias),
                     PendingDeprecationWarning)
         else:
-            package_name = '{}.v{}'.format(package_name, ES_VERSION[0])
+            package_name = '{}.v{}'.format(package_name, es_version)
 
         def _walk_dir(aliases, *parts):
             root_name = build_index_name(*parts)
@@ -134,7 +236,7 @@ class _SearchState(object):
 
                 assert index_name not in data, 'Duplicate index'
                 data[index_name] = self.mappings[index_name] = \
-                    resource_filename(
+                    self._index_files[index_name] = resource_filename(
                         package_name, os.path.join(resource_name, filename))
                 self.number_of_indexes += 1
 
@@ -142,22 +244,25 @@ class _SearchState(object):
 
         # Start the recursion here:
         _walk_dir(self.aliases, alias)
+        self._routing_fields = None
 
     def register_templates(self, directory):
         """Register templates from the provided directory.
 
         :param directory: The templates directory.
         """
+        es_version = es_major_version()
+
         try:
-            resource_listdir(directory, 'v{}'.format(ES_VERSION[0]))
-            directory = '{}/v{}'.format(directory, ES_VERSION[0])
+            resource_listdir(directory, 'v{}'.format(es_version))
+            directory = '{}/v{}'.format(directory, es_version)
         except (OSError, IOError) as ex:
             if getattr(ex, 'errno', 0) == errno.ENOENT:
                 raise OSError(
                     "Please move your templates to a subfolder named "
                     "according to the Elasticsearch version "
                     "which your templates are intended "
-                    "for. (e.g. '{}.v{}')".format(directory, ES_VERSION[0]))
+                    "for. (e.g. '{}.v{}')".format(directory, es_version))
         result = {}
         module_name, parts = directory.split('.')[0], directory.split('.')[1:]
         parts = tuple(parts)
@@ -186,6 +291,93 @@ class _SearchState(object):
         _walk_dir(parts)
         return result
 
+    def register_routing(self, name, field):
+        """Register the routing field of an index or alias.
+
+        Documents written to the index (or to the indices of the alias) are
+        routed by the value of this field (see :meth:`get_routing`) and
+        searches filtering on a value of this field are only sent to its
+        shard (see :class:`invenio_search.api.RecordsSearch`).
+
+        :param name: The index or alias name.
+        :param field: The field, e.g. ``owner`` or ``community.id``.
+        """
+        self._routing[name] = field
+        self._routing_fields = None
+
+    def get_routing_field(self, name):
+        """Return the routing field of an index or alias.
+
+        The routing field of the closest parent alias is used if the index or
+        alias has none.
+
+        :param name: The index or alias name.
+        :returns: The field or ``None``.
+        """
+        if not self._routing:
+            return None
+        if self._routing_fields is None:
+            fields = dict(self._routing)
+
+            def _walk(tree, inherited):
+                for key, value in tree.items():
+                    field = self._routing.get(key, inherited)
+                    if field:
+                        fields[key] = field
+                    if isinstance(value, dict):
+                        _walk(value, field)
+
+            _walk(self.aliases, None)
+            self._routing_fields = fields
+        return self._routing_fields.get(name)
+
+    def get_routing(self, name, document):
+        """Return the routing value of a document written to an index.
+
+        :param name: The index or alias name.
+        :param document: The document.
+        :returns: The routing value or ``None``.
+        """
+        field = self.get_routing_field(name)
+        if not field:
+            return None
+        value = document
+        for part in field.split('.'):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        if value is None or isinstance(value, (dict, list)):
+            return None
+        return str(value)
+
+    def _load_json(self, filename):
+        """Return the cached content of a JSON file.
+
+        Modified files are reloaded when the application runs in debug mode.
+        """
+        return self._json_cache.get(filename, check_mtime=self.app.debug)
+
+    def get_mapping_body(self, index):
+        """Return the parsed mapping of a registered index.
+
+        The mapping file is parsed only once and an immutable copy of its
+        content is returned (see :func:`invenio_search.utils.freeze`).
+
+        :param index: Name of a registered index.
+        """
+        try:
+            filename = self._index_files[index]
+        except KeyError:
+            raise KeyError('Index {0} is not registered.'.format(index))
+        return self._load_json(filename)
+
+    def get_template_body(self, template):
+        """Return the parsed body of a registered template.
+
+        :param template: Name of a registered template.
+        """
+        return self._load_json(self.templates[template])
+
     def load_entry_point_group_mappings(self, entry_point_group_mappings):
         """Load actions from an entry point group."""
         for ep in iter_entry_points(group=entry_point_group_mappings):
@@ -200,22 +392,207 @@ class _SearchState(object):
                     result.append(self.register_templates(template_dir))
         return result
 
-    def _client_builder(self):
-        """Build Elasticsearch client."""
+    def _entry_points_signature(self):
+        """Return the loaded entry points and their distribution versions."""
+        result = [['elasticsearch', es_major_version()]]
+        for group in (self.entry_point_group_mappings,
+                      self.entry_point_group_templates):
+            if not group:
+                continue
+            for ep in iter_entry_points(group=group):
+                dist = getattr(ep, 'dist', None)
+                result.append([
+                    group, ep.name, ep.module_name,
+                    getattr(dist, 'project_name', None),
+                    getattr(dist, 'version', None),
+                ])
+        return sorted(result, key=str)
+
+    def build_manifest(self):
+        """Build a manifest of the mappings and templates of entry points.
+
+        Package resources are always walked, even if the current state was
+        loaded from a manifest.
+        """
+        state = type(self)(
+            self.app,
+            entry_point_group_mappings=self.entry_point_group_mappings,
+            entry_point_group_templates=self.entry_point_group_templates,
+            manifest=None,
+            client=self._client,
+        )
+        return {
+            'entry_points': self._entry_points_signature(),
+            'aliases': state.aliases,
+            'number_of_indexes': state.number_of_indexes,
+            'templates': state.templates,
+        }
+
+    def write_manifest(self, path):
+        """Write a manifest file loaded on startup instead of walking packages.
+
+        :param path: Path of the manifest file.
+        """
+        with open(path, 'w') as fp:
+            json.dump(self.build_manifest(), fp, indent=2, sort_keys=True)
+
+    def load_manifest(self, path):
+        """Load registered mappings and templates from a manifest file.
+
+        The manifest is ignored if it is missing or if the installed
+        distributions providing the entry points changed since it was built.
+
+        :param path: Path of the manifest file.
+        :returns: ``True`` if the manifest was loaded.
+        """
+        try:
+            with open(path, 'r') as fp:
+                manifest = json.load(fp)
+        except (IOError, OSError, ValueError):
+            self.app.logger.warning(
+                'Cannot read search registry manifest %s.', path)
+            return False
+
+        if manifest.get('entry_points') != self._entry_points_signature():
+            self.app.logger.warning(
+                'Search registry manifest %s is outdated.', path)
+            return False
+
+        self.aliases = manifest['aliases']
+        self.number_of_indexes = manifest['number_of_indexes']
+        self._index_files = dict(_get_index_files(self.aliases))
+        self._routing_fields = None
+        if self.entry_point_group_templates:
+            self.__dict__['templates'] = manifest['templates']
+        return True
+
+    def _client_builder(self, name='default'):
+        """Build Elasticsearch client.
+
+        :param name: Name of the client profile in ``SEARCH_CLIENTS``.
+        """
         from elasticsearch import Elasticsearch
         from elasticsearch.connection import RequestsHttpConnection
 
-        return Elasticsearch(
-            hosts=self.app.config.get('SEARCH_ELASTIC_HOSTS'),
-            connection_class=RequestsHttpConnection,
-        )
+        config = self._client_config(name)
+        connection_class = config.get(
+            'connection_class', RequestsHttpConnection)
+        if not isinstance(connection_class, type):
+            connection_class = import_string(connection_class)
+        config['connection_class'] = connection_class
+
+        return Elasticsearch(**config)
+
+    def _async_client_builder(self, name='default', loop=None):
+        """Build asynchronous Elasticsearch client.
+
+        Requires the ``elasticsearch-async`` package.
+
+        :param name: Name of the client profile in ``SEARCH_CLIENTS``.
+        :param loop: Event loop of the client.
+        """
+        from elasticsearch_async import AsyncElasticsearch
+
+        config = self._client_config(name)
+        config.pop('connection_class', None)
+
+        return AsyncElasticsearch(loop=loop, **config)
+
+    def _client_config(self, name):
+        """Return the parameters of a client profile."""
+        profiles = self.app.config.get('SEARCH_CLIENTS') or {}
+        if name != 'default' and name not in profiles:
+            raise KeyError('Search client {0} is not configured.'.format(name))
+        config = dict(self.app.config.get('SEARCH_CLIENT_CONFIG') or {})
+        config.update(profiles.get(name) or {})
+        config.setdefault('hosts', self.app.config.get('SEARCH_ELASTIC_HOSTS'))
+        return config
 
     @property
     def client(self):
         """Return client for current application."""
-        if self._client is None:
-            self._client = self._client_builder()
-        return self._client
+        return self.get_client()
+
+    def get_client(self, name='default'):
+        """Return a named client, building it on first access.
+
+        Clients are built once per process: a client inherited from the
+        parent process after a fork (e.g. by pre-forking servers or Celery)
+        is discarded, as its pooled connections are shared with the parent.
+
+        :param name: Name of the client profile in ``SEARCH_CLIENTS``.
+        """
+        if name == 'default' and self._client is not None:
+            return self._client
+        # Built clients are returned without waiting for the lock.
+        if self._clients_pid == os.getpid():
+            client = self._clients.get(name)
+            if client is not None:
+                return client
+        with self._clients_lock:
+            self._check_pid()
+            if name not in self._clients:
+                self._clients[name] = self._client_builder(name)
+            return self._clients[name]
+
+    def get_async_client(self, name='default'):
+        """Return a named asynchronous client for the current event loop.
+
+        Clients are built on first access, once per event loop and process.
+
+        :param name: Name of the client profile in ``SEARCH_CLIENTS``.
+        """
+        import asyncio
+
+        loop = asyncio.get_event_loop()
+        with self._clients_lock:
+            self._check_pid()
+            clients = self._async_clients.setdefault(loop, {})
+            if name not in clients:
+                clients[name] = self._async_client_builder(name, loop=loop)
+            return clients[name]
+
+    @property
+    def async_client(self):
+        """Return asynchronous client for the current event loop."""
+        return self.get_async_client()
+
+    def _check_pid(self):
+        """Discard clients inherited from a parent process."""
+        if self._clients_pid != os.getpid():
+            self._clients = {}
+            self._async_clients = WeakKeyDictionary()
+            self._clients_pid = os.getpid()
+
+    def reset_client(self, name=None):
+        """Discard built clients without closing their connections.
+
+        Use it e.g. in a post-fork hook, as closing the connections in a
+        child process would also affect its parent.
+
+        :param name: Name of the client to discard (default: all of them).
+        """
+        with self._clients_lock:
+            if name is None:
+                self._clients = {}
+                self._async_clients = WeakKeyDictionary()
+            else:
+                self._clients.pop(name, None)
+                for clients in self._async_clients.values():
+                    clients.pop(name, None)
+
+    def close(self):
+        """Close the connections of all built clients and discard them."""
+        with self._clients_lock:
+            clients, self._clients = self._clients, {}
+        if self._clients_pid == os.getpid():
+            for client in clients.values():
+                client.transport.close()
+
+    @property
+    def clients(self):
+        """Return a mapping of named clients built on first access."""
+        return _SearchClients(self)
 
     def flush_and_refresh(self, index):
         """Flush and refresh one or more indices.
@@ -229,8 +606,79 @@ class _SearchState(object):
         self.client.indices.refresh(index=index)
         self.client.cluster.health(wait_for_status='yellow',
                                    request_timeout=30)
+        self.invalidate_cache(index)
         return True
 
+    @cached_property
+    def results_cache(self):
+        """Return the backend of the search results cache.
+
+        See ``SEARCH_RESULTS_CACHE``.
+        """
+        factory = self.app.config.get('SEARCH_RESULTS_CACHE')
+        if factory is None:
+            return LRUCache(
+                maxsize=self.app.config.get('SEARCH_RESULTS_CACHE_SIZE', 1000))
+        if not callable(factory):
+            factory = import_string(factory)
+        return factory(self.app)
+
+    @staticmethod
+    def _generation_key(name):
+        """Return the cache key of the generation of an index or alias."""
+        return 'invenio-search:generation:{0}'.format(name)
+
+    def cache_generations(self, names):
+        """Return the current cache generation of indices or aliases.
+
+        The generations are part of the keys of cached search results, so
+        that :meth:`invalidate_cache` makes the old results unreachable.
+
+        :param names: List of index or alias names.
+        """
+        cache = self.results_cache
+        return [cache.get(self._generation_key(name)) or 0 for name in names]
+
+    def invalidate_cache(self, *names):
+        """Invalidate the cached search results of indices or aliases.
+
+        The results of searches on the indices of the given aliases, on the
+        aliases containing the given indices and on ``_all`` are invalidated
+        too, ``_all`` invalidates every registered index and alias. Call it
+        after refreshing an index, so that new documents become visible to
+        cached searches.
+
+        :param names: Index or alias names (lists and comma separated names
+            are accepted).
+        """
+        if 'results_cache' not in self.__dict__:
+            # Nothing was cached yet by this process.
+            if self.app.config.get('SEARCH_RESULTS_CACHE') is None:
+                return
+
+        leaves = set()
+        for name in names:
+            if isinstance(name, (list, tuple, set)):
+                leaves.update(name)
+            elif name:
+                leaves.update(name.split(','))
+
+        aliases = dict(
+            (alias, set(indices))
+            for alias, indices in _get_aliases(self.aliases))
+        expanded = set(leaves)
+        if '_all' in leaves:
+            expanded.update(_get_indices(self.aliases))
+        for name in leaves:
+            expanded.update(aliases.get(name, ()))
+        stale = expanded | set(['_all'])
+        stale.update(alias for alias, indices in aliases.items()
+                     if indices & expanded)
+
+        cache = self.results_cache
+        for name in stale:
+            cache.inc(self._generation_key(name))
+
     @property
     def cluster_version(self):
         """Get version of Elasticsearch running on the cluster."""
@@ -254,78 +702,632 @@ class _SearchState(object):
                 for k, v in self.aliases.items() if k in whitelisted_aliases
             }
 
-    def create(self, ignore=None):
-        """Yield tuple with created index name and responses from a client."""
+    def create(self, ignore=None, workers=None, skip_existing=False):
+        """Yield tuple with created index name and responses from a client.
+
+        All indices are created first and the aliases are put afterwards
+        (see :meth:`update_aliases`), so that an alias is only put once all of
+        its indices exist.
+
+        :param ignore: List of HTTP status codes to ignore.
+        :param workers: Number of indices to create in parallel (default:
+            create them one by one).
+        :param skip_existing: Only create the indices and put the aliases
+            missing from the cluster (see :meth:`plan_create`). The response
+            of existing indices is ``None``.
+        """
         ignore = ignore or []
+        client = self.client
+
+        def _create_index(args):
+            """Create an index from its mapping file."""
+            name, filename = args
+            return name, client.indices.create(
+                index=name,
+                body=self._load_json(filename),
+                ignore=ignore,
+            )
+
+        index_files = _get_index_files(self.active_aliases)
+        aliases = _get_aliases(self.active_aliases)
+        if skip_existing:
+            indices, aliases = self.plan_create()
+            indices = set(indices)
+            index_files = list(index_files)
+            for name, filename in index_files:
+                if name not in indices:
+                    yield name, None
+            index_files = [(name, filename) for name, filename in index_files
+                           if name in indices]
+
+        for result in parallel_map(_create_index, index_files,
+                                   workers=workers):
+            yield result
 
-        def _create(tree_or_filename, alias=None):
-            """Create indices and aliases by walking DFS."""
-            # Iterate over aliases:
-            for name, value in tree_or_filename.items():
-                if isinstance(value, dict):
-                    for result in _create(value, alias=name):
-                        yield result
-                else:
-                    with open(value, 'r') as body:
-                        yield name, self.client.indices.create(
-                            index=name,
-                            body=json.load(body),
-                            ignore=ignore,
-                        )
-
-            if alias:
-                yield alias, self.client.indices.put_alias(
-                    index=list(_get_indices(tree_or_filename)),
-                    name=alias,
-                    ignore=ignore,
-                )
+        for result in self.update_aliases('add', aliases, ignore=ignore):
+            yield result
+
+    def get_existing_indices(self):
+        """Return the registered indices existing in the cluster.
+
+        The aliases of all the indices are fetched in bulk. Registered indices
+        which are aliases of their reindexed copy (see :meth:`reindex`) are
+        resolved to the copy.
+
+        :returns: Dictionary of the existing index names and dictionaries of
+            their concrete index names and set of alias names.
+        """
+        return self._get_concrete_indices(_get_indices(self.active_aliases))
+
+    def plan_create(self, existing=None):
+        """Return the registered indices and aliases missing from the cluster.
+
+        :param existing: Existing indices as returned by
+            :meth:`get_existing_indices` (default: fetch them).
+        :returns: Tuple with the list of missing index names and the list of
+            tuples with alias name and its missing indices.
+        """
+        if existing is None:
+            existing = self.get_existing_indices()
+        index_aliases = dict(
+            (index, set().union(*value.values()))
+            for index, value in existing.items())
+        indices = [name for name in _get_indices(self.active_aliases)
+                   if name not in index_aliases]
+        aliases = []
+        for alias, alias_indices in _get_aliases(self.active_aliases):
+            missing = [index for index in alias_indices
+                       if alias not in index_aliases.get(index, ())]
+            if missing:
+                aliases.append((alias, missing))
+        return indices, aliases
+
+    def diff_mappings(self, existing=None):
+        """Yield tuple with index name, status and diff of its mapping.
+
+        The status is ``missing`` if the index does not exist, ``changed``
+        if its mapping in the cluster differs from the registered one (the
+        diff is a list of lines in the unified format) and ``unchanged``
+        otherwise.
+
+        :param existing: Existing indices as returned by
+            :meth:`get_existing_indices` (default: fetch them).
+        """
+        if existing is None:
+            existing = self.get_existing_indices()
+        index_files = list(_get_index_files(self.active_aliases))
+        response = self._fetch_in_chunks(
+            self.client.indices.get_mapping,
+            sorted(set(name for value in existing.values() for name in value)),
+            ignore_unavailable=True)
+
+        for name, filename in index_files:
+            concrete = sorted(existing.get(name) or ())
+            if not concrete or concrete[0] not in response:
+                yield name, 'missing', []
+                continue
+            current = _stringify(response[concrete[0]].get('mappings') or {})
+            registered = _stringify(
+                self._load_json(filename).get('mappings') or {})
+            if current == registered:
+                yield name, 'unchanged', []
+                continue
+            yield name, 'changed', list(difflib.unified_diff(
+                json.dumps(current, indent=2, sort_keys=True).splitlines(),
+                json.dumps(registered, indent=2, sort_keys=True).splitlines(),
+                fromfile='{0} (cluster)'.format(name),
+                tofile=filename,
+                lineterm='',
+            ))
+
+    def _get_concrete_indices(self, indices):
+        """Return the concrete indices behind index names.
+
+        :param indices: Names of the indices or aliases.
+        :returns: Dictionary of the existing names and dictionaries of their
+            concrete index names and set of alias names.
+        """
+        indices = set(indices)
+        result = {}
+        response = self._fetch_in_chunks(
+            self.client.indices.get_alias, sorted(indices),
+            ignore_unavailable=True)
+        for name, value in response.items():
+            aliases = set((value or {}).get('aliases') or {})
+            for index in indices & (aliases | set([name])):
+                result.setdefault(index, {})[name] = aliases
+        return result
+
+    def _fetch_in_chunks(self, method, names, param='index', **kwargs):
+        """Call a read API for many names in requests of bounded length.
+
+        :param method: Client method, e.g. ``client.indices.get_alias``.
+        :param names: Names of the indices or templates.
+        :param param: Name of the parameter receiving the names.
+        :param kwargs: Additional parameters of the requests.
+        :returns: Merged dictionary of the responses.
+        """
+        result = {}
+        chunk = []
+
+        def _fetch(part):
+            """Fetch the information of some names."""
+            params = dict(kwargs, ignore=[404])
+            params[param] = ','.join(part)
+            response = method(**params)
+            if isinstance(response, dict) and 'error' not in response:
+                result.update(response)
+
+        # Keep the request lines short.
+        for name in names:
+            chunk.append(name)
+            if sum(len(name) + 1 for name in chunk) > 2000:
+                _fetch(chunk)
+                chunk = []
+        if chunk:
+            _fetch(chunk)
+        return result
 
-        for result in _create(self.active_aliases):
+    def put_templates(self, ignore=None, workers=None, force=False):
+        """Yield tuple with registered template and response from client.
+
+        Templates identical to the ones of the cluster are not uploaded and
+        their response is ``None`` (see :meth:`sync_templates`).
+
+        :param ignore: List of HTTP status codes to ignore.
+        :param workers: Number of templates uploaded in parallel.
+        :param force: Upload all the templates.
+        """
+        for template, status, response in self.sync_templates(
+                ignore=ignore, workers=workers, force=force):
+            yield self.templates[template], response
+
+    def sync_templates(self, ignore=None, workers=None, force=False):
+        """Yield tuple with template name, status and response of uploads.
+
+        The existing templates are fetched in bulk and only the missing
+        (status ``created``) or different (status ``updated``) templates are
+        uploaded. Identical ones have the status ``skipped``
+        and no response.
+
+        :param ignore: List of HTTP status codes to ignore.
+        :param workers: Number of templates uploaded in parallel.
+        :param force: Upload all the templates.
+        """
+        ignore = ignore or []
+        client = self.client
+
+        existing = {}
+        if not force:
+            existing = self._fetch_in_chunks(
+                client.indices.get_template, sorted(self.templates),
+                param='name')
+
+        def _sync(template):
+            """Upload a template if it differs from the existing one."""
+            body = self.get_template_body(template)
+            if template not in existing:
+                status = 'created'
+            elif _normalize_template(existing[template]) != \
+                    _normalize_template(body):
+                status = 'updated'
+            else:
+                return template, 'skipped', None
+            return template, status, client.indices.put_template(
+                name=template,
+                body=body,
+                ignore=ignore,
+            )
+
+        for result in parallel_map(_sync, list(self.templates),
+                                   workers=workers):
             yield result
 
-    def put_templates(self, ignore=None):
-        """Yield tuple with registered template and response from client."""
+    def delete(self, ignore=None):
+        """Yield tuple with deleted index name and responses from a client.
+
+        All aliases are removed first (see :meth:`update_aliases`) and the
+        indices are deleted afterwards.
+
+        :param ignore: List of HTTP status codes to ignore.
+        """
         ignore = ignore or []
+        aliases, indices = self._plan_delete()
+        for result in self.update_aliases('remove', aliases, ignore=ignore):
+            yield result
+
+        for name, concrete in indices:
+            yield name, self.client.indices.delete(
+                index=','.join(concrete),
+                ignore=ignore,
+            )
+            self.invalidate_cache(name)
+
+    def _plan_delete(self):
+        """Return the aliases and indices to delete.
+
+        Registered indices which are aliases of their reindexed copy (see
+        :meth:`reindex`) are resolved to the copy.
+
+        :returns: Tuple with the list of tuples with alias name and its
+            concrete indices, and the list of tuples with registered index
+            name and its concrete indices.
+        """
+        indices = list(_get_indices(self.active_aliases))
+        concrete = self._get_concrete_indices(indices)
+
+        def _resolve(index):
+            """Return the concrete indices behind a registered index."""
+            return sorted(concrete.get(index) or [index])
+
+        aliases = [(alias, [name for index in alias_indices
+                            for name in _resolve(index)])
+                   for alias, alias_indices
+                   in _get_aliases(self.active_aliases)]
+        return aliases, [(index, _resolve(index)) for index in indices]
+
+    def reindex(self, index, source=None, suffix=None, delete_old=False,
+                size=1000, slices=None, requests_per_second=None,
+                request_timeout=None, poll_interval=5):
+        """Yield tuple with step name and response while reindexing an index.
+
+        A new index named ``<index>-<suffix>`` is created from the registered
+        mapping of ``index``, the documents of ``source`` are copied into it
+        and the aliases of ``index`` are switched atomically to the new index.
+        Refreshes and replicas are disabled on the new index while copying.
+        On Elasticsearch 5 and later, the copy runs as a task which is polled
+        until it completes. The new index is deleted if the copy fails.
+
+        Documents written to the old indices while copying are not copied
+        over, pause the indexing until the aliases are switched or index the
+        changed documents again afterwards.
+
+        The name of the registered index becomes an alias of the new index
+        once no index of that name exists anymore, i.e. with ``delete_old``
+        or after a previous reindexing, so that the index can be reindexed
+        again and deleted later on.
+
+        :param index: Name of a registered index.
+        :param source: Index to copy documents from (default: the indices
+            currently behind ``index``).
+        :param suffix: Suffix of the new index (default: current timestamp).
+        :param delete_old: Delete the indices currently behind ``index`` once
+            aliases are switched.
+        :param size: Number of documents copied per batch.
+        :param slices: Number of slices the copy is split into (Elasticsearch
+            5 and later).
+        :param requests_per_second: Throttle the copy (Elasticsearch 5 and
+            later).
+        :param request_timeout: Timeout in seconds of the requests submitting
+            and polling the copy (of the copy requests on Elasticsearch 2).
+        :param poll_interval: Seconds between the polls of the copy task.
+        """
+        from elasticsearch import VERSION as ES_VERSION
+
+        body = self.get_mapping_body(index)
+        current = self._get_concrete_indices([index]).get(index)
+        if not current:
+            raise ValueError('Index {0} does not exist.'.format(index))
+        source = source or sorted(current)
+        target = '{0}-{1}'.format(
+            index, suffix or datetime.utcnow().strftime('%Y%m%d%H%M%S'))
+        client = self.client
+
+        yield 'create', client.indices.create(index=target, body=body)
 
-        def _put_template(template):
-            """Put template in search client."""
-            with open(self.templates[template], 'r') as body:
-                return self.templates[template],\
-                    current_search_client.indices.put_template(
-                        name=template,
-                        body=json.load(body),
-                        ignore=ignore,
+        try:
+            settings = client.indices.get_settings(
+                index=target)[target]['settings']['index']
+            client.indices.put_settings(index=target, body={'index': {
+                'refresh_interval': '-1',
+                'number_of_replicas': 0,
+            }})
+
+            if ES_VERSION[0] == 2:
+                from elasticsearch.helpers import reindex as _reindex
+                success, errors = _reindex(
+                    client, source, target, chunk_size=size,
+                    scan_kwargs=dict(request_timeout=request_timeout),
+                    bulk_kwargs=dict(request_timeout=request_timeout,
+                                     stats_only=True),
+                )
+                response = {'total': success + errors, 'failures': errors}
+            else:
+                response = self._run_reindex_task(
+                    {'source': {'index': source, 'size': size},
+                     'dest': {'index': target}},
+                    slices=slices, requests_per_second=requests_per_second,
+                    request_timeout=request_timeout,
+                    poll_interval=poll_interval,
                 )
+            if response.get('failures'):
+                raise RuntimeError(
+                    'Reindexing {0} into {1} failed: {2}'.format(
+                        source, target, response['failures']))
+        except Exception:
+            client.indices.delete(index=target, ignore=[404])
+            raise
+        yield 'reindex', response
+
+        client.indices.put_settings(index=target, body={'index': {
+            'refresh_interval': settings.get('refresh_interval', '1s'),
+            'number_of_replicas': settings['number_of_replicas'],
+        }})
+        client.indices.refresh(index=target)
+
+        aliases = [alias for alias, indices in _get_aliases(self.aliases)
+                   if index in indices]
+        actions = []
+        if not delete_old:
+            actions.extend(
+                {'remove': {'index': name, 'alias': alias}}
+                for name in sorted(current)
+                for alias in aliases + [index] if alias in current[name])
+        actions.extend({'add': {'index': target, 'alias': alias}}
+                       for alias in aliases)
+        # Indices cannot be deleted atomically before Elasticsearch 6.
+        remove_index = delete_old and ES_VERSION[0] >= 6
+        if remove_index or index not in current:
+            actions.append({'add': {'index': target, 'alias': index}})
+        if remove_index:
+            actions.extend({'remove_index': {'index': name}}
+                           for name in sorted(current))
+        if actions:
+            yield 'aliases', client.indices.update_aliases(
+                body={'actions': actions})
+        if delete_old and not remove_index:
+            yield 'delete', client.indices.delete(
+                index=','.join(sorted(current)))
+            if index in current:
+                client.indices.put_alias(index=target, name=index)
+        self.invalidate_cache(index, *(sorted(current) + aliases))
+
+    def _run_reindex_task(self, body, slices=None, requests_per_second=None,
+                          request_timeout=None, poll_interval=5):
+        """Submit a reindex task and wait until it completes.
+
+        The copy can outlast any request timeout, so it runs as a task
+        instead of a single blocking (and retried) request.
+
+        :returns: Response of the reindex.
+        """
+        client = self.client
+        params = dict(wait_for_completion=False, refresh=True)
+        if slices:
+            params['slices'] = slices
+        if requests_per_second:
+            params['requests_per_second'] = requests_per_second
+        if request_timeout:
+            params['request_timeout'] = request_timeout
+        task_id = client.reindex(body=body, **params)['task']
+
+        params = dict(request_timeout=request_timeout) \
+            if request_timeout else {}
+        while True:
+            task = client.tasks.get(task_id=task_id, **params)
+            if task.get('completed'):
+                break
+            time.sleep(poll_interval)
+        if task.get('error'):
+            raise RuntimeError('Reindex task {0} failed: {1}'.format(
+                task_id, task['error']))
+        return task.get('response') or {}
+
+    def rollover(self, aliases=None, dry_run=False):
+        """Yield tuple with step name, index name and response of rollovers.
+
+        For every write alias of ``SEARCH_ROLLOVER_ALIASES``, the first
+        generation is created if the alias does not exist yet. Otherwise
+        a new generation is created if the rollover conditions are met, the
+        previous generation is force merged and the generations beyond
+        ``max_generations`` are deleted. Run it periodically, e.g. with the
+        ``index rollover`` command.
+
+        :param aliases: Names of the aliases (default: all of them).
+        :param dry_run: Only report the steps which would be done.
+        :raises invenio_search.errors.RolloverAliasNotConfigured: If an alias
+            is not configured.
+        :raises invenio_search.errors.RolloverNotSupported: Before
+            Elasticsearch 5.
+        """
+        es_version = es_major_version()
+        if es_version < 5:
+            raise RolloverNotSupported(es_version)
+
+        config = self.app.config.get('SEARCH_ROLLOVER_ALIASES') or {}
+        client = self.client
+
+        for alias in aliases or sorted(config):
+            if alias not in config:
+                raise RolloverAliasNotConfigured(alias)
+            options = config[alias]
+
+            if not client.indices.exists_alias(name=alias):
+                index = '{0}-000001'.format(alias)
+                response = None
+                if not dry_run:
+                    response = client.indices.create(
+                        index=index, body={'aliases': {alias: {}}})
+                yield 'bootstrap', index, response
+                continue
+
+            response = client.indices.rollover(
+                alias=alias,
+                body={'conditions': options.get('conditions', {})},
+                dry_run=dry_run,
+            )
+            yield 'rollover', alias, response
+            rolled_over = response.get('rolled_over')
+            if rolled_over:
+                self.invalidate_cache(alias)
+                if options.get('forcemerge', True):
+                    yield 'forcemerge', response['old_index'], \
+                        client.indices.forcemerge(
+                            index=response['old_index'], max_num_segments=1,
+                            request_timeout=options.get(
+                                'forcemerge_timeout', 3600))
+
+            max_generations = options.get('max_generations')
+            if not max_generations:
+                continue
+            pattern = re.compile(r'^{0}-\d+$'.format(re.escape(alias)))
+            generations = sorted(
+                index for index
+                in client.indices.get_alias(index='{0}-*'.format(alias))
+                if pattern.match(index))
+            if dry_run and any(response.get('conditions', {}).values()):
+                generations.append(response['new_index'])
+            for index in generations[:-max_generations]:
+                response = None
+                if not dry_run:
+                    response = client.indices.delete(index=index)
+                    self.invalidate_cache(index)
+                yield 'delete', index, response
+
+    def bulk(self, actions, chunk_size=500, max_chunk_bytes=10485760,
+             workers=None, max_retries=3, initial_backoff=2, max_backoff=60,
+             **kwargs):
+        """Yield tuple with success flag and result for every bulk action.
+
+        The actions are consumed lazily, grouped into chunks limited by the
+        number of actions and their (approximate) size in bytes and sent
+        through the ``_bulk`` API. Actions rejected because the cluster is
+        overloaded (HTTP 429) are retried with exponential backoff. The
+        routing of the documents is set from their registered routing field
+        (see :meth:`register_routing`), unless set by the action. Delete
+        actions have no document, thus they must set their routing.
+
+        :param actions: Iterable of actions in the format accepted by the
+            ``elasticsearch.helpers.bulk`` helper.
+        :param chunk_size: Maximum number of actions per request.
+        :param max_chunk_bytes: Maximum size of a request in bytes.
+        :param workers: Number of requests sent in parallel.
+        :param max_retries: Maximum number of retries of rejected actions.
+        :param initial_backoff: Seconds to wait before the first retry, it is
+            doubled for every subsequent retry.
+        :param max_backoff: Maximum number of seconds to wait between retries.
+        :param kwargs: Additional parameters passed to the ``bulk`` call.
+        :raises ValueError: If a delete action on an index with a registered
+            routing field has no routing.
+        """
+        from elasticsearch import VERSION as ES_VERSION
+        from elasticsearch.exceptions import TransportError
+        from elasticsearch.helpers import expand_action
+
+        client = self.client
+        serializer = client.transport.serializer
+
+        routing_key = '_routing' if ES_VERSION[0] < 7 else 'routing'
+
+        def _route(action):
+            """Set the registered routing of an action."""
+            if not isinstance(action, dict) or \
+                    '_routing' in action or 'routing' in action:
+                return action
+            index = action.get('_index', kwargs.get('index'))
+            if action.get('_op_type') == 'delete':
+                if self.get_routing_field(index):
+                    raise ValueError(
+                        'Delete action of document {0} in {1} has no '
+                        'routing.'.format(action.get('_id'), index))
+                return action
+            routing = self.get_routing(index, action.get('_source', action))
+            if routing is None:
+                return action
+            return dict(action, **{routing_key: routing})
+
+        def _chunks():
+            """Group serialized actions by count and size."""
+            chunk, chunk_bytes = [], 0
+            for action in actions:
+                op, data = expand_action(_route(action))
+                lines = [serializer.dumps(op)]
+                if data is not None:
+                    lines.append(serializer.dumps(data))
+                size = sum(len(line) + 1 for line in lines)
+                if chunk and (len(chunk) >= chunk_size or
+                              chunk_bytes + size > max_chunk_bytes):
+                    yield chunk
+                    chunk, chunk_bytes = [], 0
+                chunk.append(lines)
+                chunk_bytes += size
+            if chunk:
+                yield chunk
+
+        def _send(chunk):
+            """Send a chunk, retrying the rejected actions."""
+            results = [None] * len(chunk)
+            pending = list(range(len(chunk)))
+            for attempt in range(max_retries + 1):
+                if attempt:
+                    time.sleep(min(max_backoff,
+                                   initial_backoff * 2 ** (attempt - 1)))
+                body = '\n'.join(
+                    line for i in pending for line in chunk[i]) + '\n'
+                try:
+                    response = client.bulk(body=body, **kwargs)
+                except TransportError as ex:
+                    if ex.status_code == 429 and attempt < max_retries:
+                        continue
+                    raise
+                retry = []
+                for i, item in zip(pending, response['items']):
+                    op_type, info = item.popitem()
+                    status = info.get('status', 500)
+                    if status == 429 and attempt < max_retries:
+                        retry.append(i)
+                    else:
+                        results[i] = (200 <= status < 300, {op_type: info})
+                pending = retry
+                if not pending:
+                    break
+            return results
+
+        for results in parallel_map(_send, _chunks(), workers=workers):
+            for result in results:
+                yield result
 
-        for template in self.templates:
-            yield _put_template(template)
+    def update_aliases(self, action, aliases, ignore=None):
+        """Yield tuple with alias name and response of a batched update.
 
-    def delete(self, ignore=None):
-        """Yield tuple with deleted index name and responses from a client."""
+        All alias changes are sent through a single (atomic) ``_aliases``
+        request, unless ``SEARCH_ALIASES_CHUNK_SIZE`` limits the number of
+        actions per request.
+
+        :param action: Alias action, either ``'add'`` or ``'remove'``.
+        :param aliases: Iterable of tuples with alias name and its indices.
+        :param ignore: List of HTTP status codes to ignore.
+        """
         ignore = ignore or []
 
-        def _delete(tree_or_filename, alias=None):
-            """Delete indexes and aliases by walking DFS."""
-            if alias:
-                yield alias, self.client.indices.delete_alias(
-                    index=list(_get_indices(tree_or_filename)),
-                    name=alias,
+        for names, actions in self._alias_actions(action, aliases):
+            response = None
+            if actions:
+                response = self.client.indices.update_aliases(
+                    body={'actions': actions},
                     ignore=ignore,
                 )
+                self.invalidate_cache(*names)
+            for name in names:
+                yield name, response
 
-            # Iterate over aliases:
-            for name, value in tree_or_filename.items():
-                if isinstance(value, dict):
-                    for result in _delete(value, alias=name):
-                        yield result
-                else:
-                    yield name, self.client.indices.delete(
-                        index=name,
-                        ignore=ignore,
-                    )
-
-        for result in _delete(self.active_aliases):
-            yield result
+    def _alias_actions(self, action, aliases):
+        """Yield tuples with alias names and actions of one request."""
+        chunk_size = self.app.config.get('SEARCH_ALIASES_CHUNK_SIZE')
+        names, actions = [], []
+
+        for alias, indices in aliases:
+            names.append(alias)
+            actions.extend(
+                {action: {'index': index, 'alias': alias}}
+                for index in indices
+            )
+            if chunk_size and len(actions) >= chunk_size:
+                yield names, actions
+                names, actions = [], []
+
+        if names:
+            yield names, actions
 
 
 class InvenioSearch(object):
@@ -335,8 +1337,6 @@ class InvenioSearch(object):
 
         :param app: An instance of :class:`~flask.app.Flask`.
         """
-        self._clients = {}
-
         if app:
             self.init_app(app, **kwargs)
 
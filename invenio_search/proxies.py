@@ -22,5 +22,11 @@ def _get_current_search_client():
     return _get_current_search().client
 
 
+def _get_current_search_clients():
+    """Return named search clients."""
+    return _get_current_search().clients
+
+
 current_search = LocalProxy(_get_current_search)
 current_search_client = LocalProxy(_get_current_search_client)
+current_search_clients = LocalProxy(_get_current_search_clients)
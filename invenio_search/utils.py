@@ -8,7 +8,18 @@
 
 """Utility functions for search engine."""
 
+import base64
+import json
 import os
+import threading
+import time
+from collections import OrderedDict, deque
+from multiprocessing.pool import ThreadPool
+
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
 
 
 def build_index_name(*parts):
@@ -51,3 +62,231 @@ def schema_to_index(schema, index_names=None):
             return (index_name, doc_type[0])
 
     return (None, None)
+
+
+def encode_cursor(values):
+    """Encode the sort values of a hit into an opaque cursor.
+
+    :param values: List of sort values (``hit.meta.sort``).
+    :returns: URL-safe string.
+    """
+    data = json.dumps(list(values), separators=(',', ':')).encode('utf8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor returned by :func:`encode_cursor`.
+
+    :param cursor: The cursor.
+    :returns: List of sort values.
+    :raises ValueError: If the cursor is invalid.
+    """
+    try:
+        data = base64.urlsafe_b64decode(
+            str(cursor) + '=' * (-len(cursor) % 4))
+        values = json.loads(data.decode('utf8'))
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor {0!r}: {1}'.format(cursor, e))
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor {0!r}.'.format(cursor))
+    return values
+
+
+def parallel_map(func, iterable, workers=None, ordered=True):
+    """Apply a function to every item of an iterable using a thread pool.
+
+    Results are yielded in the same order as the input items, unless
+    ``ordered`` is false. At most ``2 * workers`` items are consumed ahead of
+    the results, so that long (or infinite) iterables are never read
+    completely into memory.
+
+    :param func: Function called with each item.
+    :param iterable: Items to process.
+    :param workers: Number of threads. With ``None`` or ``1`` the items are
+        processed sequentially in the calling thread.
+    :param ordered: Yield the results in the order of the items, otherwise
+        as soon as they are available.
+    """
+    if not workers or workers <= 1:
+        for item in iterable:
+            yield func(item)
+        return
+
+    pool = ThreadPool(workers)
+    try:
+        if ordered:
+            pending = deque()
+            for item in iterable:
+                pending.append(pool.apply_async(func, (item, )))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+            return
+
+        done = Queue()
+
+        def _call(item):
+            try:
+                return True, func(item)
+            except Exception as e:
+                return False, e
+
+        def _get():
+            success, result = done.get()
+            if not success:
+                raise result
+            return result
+
+        pending = 0
+        for item in iterable:
+            pool.apply_async(_call, (item, ), callback=done.put)
+            pending += 1
+            if pending >= 2 * workers:
+                pending -= 1
+                yield _get()
+        for _ in range(pending):
+            yield _get()
+    finally:
+        pool.terminate()
+
+
+class FrozenDict(dict):
+    """Read-only dictionary returned by :func:`freeze`."""
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('{0} is immutable.'.format(type(self).__name__))
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = \
+        update = _immutable
+
+    def __copy__(self):
+        """Return a mutable shallow copy."""
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        """Return a mutable deep copy."""
+        return thaw(self)
+
+    def __reduce__(self):
+        """Pickle as a regular dictionary."""
+        return (dict, (dict(self), ))
+
+
+def freeze(obj):
+    """Return an immutable copy of a JSON-like object.
+
+    Dictionaries are converted to :class:`FrozenDict` and lists to tuples.
+    """
+    if isinstance(obj, dict):
+        return FrozenDict((k, freeze(v)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj):
+    """Return a mutable copy of an object returned by :func:`freeze`."""
+    if isinstance(obj, dict):
+        return dict((k, thaw(v)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return [thaw(v) for v in obj]
+    return obj
+
+
+class JSONFileCache(object):
+    """Cache of parsed JSON files.
+
+    Each file is parsed on first access and an immutable copy of its content
+    (see :func:`freeze`) is kept in memory.
+    """
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._cache = {}
+
+    def get(self, filename, check_mtime=False):
+        """Return the parsed content of a file.
+
+        :param filename: Path of the JSON file.
+        :param check_mtime: Reload the file if it was modified since it was
+            cached.
+        """
+        entry = self._cache.get(filename)
+        if entry is None or (
+                check_mtime and entry[0] != os.path.getmtime(filename)):
+            mtime = os.path.getmtime(filename)
+            with open(filename, 'r') as fp:
+                entry = self._cache[filename] = (mtime, freeze(json.load(fp)))
+        return entry[1]
+
+    def clear(self):
+        """Remove all cached files."""
+        self._cache.clear()
+
+
+class LRUCache(object):
+    """Thread-safe in-process cache with a bounded size and expiration.
+
+    It implements the subset of the Flask-Caching backend interface used by
+    the search results cache (``get``, ``set``, ``delete``, ``inc`` and
+    ``clear``), so that it can be replaced by a shared backend (e.g. Redis).
+    Counters set with ``inc`` are never evicted.
+    """
+
+    def __init__(self, maxsize=1000):
+        """Initialize an empty cache.
+
+        :param maxsize: Maximum number of cached values.
+        """
+        self.maxsize = maxsize
+        self._values = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return a cached value or ``None``."""
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            entry = self._values.pop(key, None)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.time():
+                return None
+            self._values[key] = entry
+            return value
+
+    def set(self, key, value, timeout=None):
+        """Cache a value.
+
+        :param timeout: Number of seconds after which the value expires
+            (default: never).
+        """
+        expires = time.time() + timeout if timeout else None
+        with self._lock:
+            self._values.pop(key, None)
+            self._values[key] = (expires, value)
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+        return True
+
+    def delete(self, key):
+        """Remove a value."""
+        with self._lock:
+            self._counters.pop(key, None)
+            return self._values.pop(key, None) is not None
+
+    def inc(self, key, delta=1):
+        """Increment a counter and return its new value."""
+        with self._lock:
+            value = self._counters[key] = self._counters.get(key, 0) + delta
+            return value
+
+    def clear(self):
+        """Remove all values and counters."""
+        with self._lock:
+            self._values.clear()
+            self._counters.clear()
+        return True
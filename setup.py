@@ -45,6 +45,9 @@ extras_require = {
         'elasticsearch>=6.0.0,<7.0.0',
         'elasticsearch-dsl>=6.0.0,<7.0.0',
     ],
+    'async': [
+        'elasticsearch-async>=5.0.0',
+    ],
     'records': [
         'invenio-records>=1.0.0',
     ],
@@ -54,7 +57,7 @@ extras_require = {
 extras_require['all'] = []
 for name, reqs in extras_require.items():
     if name[0] == ':' or name in (
-            'elasticsearch2', 'elasticsearch5', 'elasticsearch6'):
+            'async', 'elasticsearch2', 'elasticsearch5', 'elasticsearch6'):
         continue
     extras_require['all'].extend(reqs)
 
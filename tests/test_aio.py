@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015-2018 CERN.
+#
+# Invenio is free software; you can redistribute it and/or modify it
+# under the terms of the MIT License; see LICENSE file for more details.
+
+
+"""Asynchronous API tests."""
+
+from __future__ import absolute_import, print_function
+
+import asyncio
+
+import pytest
+from elasticsearch_dsl import Q
+from mock import MagicMock, patch
+
+from invenio_search import aio
+from invenio_search.aio import AsyncRecordsSearch
+
+
+class AsyncClient(object):
+    """Asynchronous client returning canned responses."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def __getattr__(self, name):
+        async def method(**kwargs):
+            self.calls.append((name, kwargs))
+            return self.responses.pop(0)
+        return method
+
+
+def test_async_search(app):
+    """Test execution of searches with the asynchronous client."""
+    hit = {'_index': 'test', '_type': 'test', '_id': '1',
+           '_source': {'title': 'Higgs'}}
+    client = AsyncClient(
+        {'hits': {'total': 1, 'hits': [hit]}},
+        {'_scroll_id': 's1', 'hits': {'total': 2, 'hits': [hit]}},
+        {'_scroll_id': 's1', 'hits': {'total': 2, 'hits': [hit]}},
+        {'_scroll_id': 's1', 'hits': {'total': 2, 'hits': []}},
+        {},
+    )
+
+    async def run():
+        search = AsyncRecordsSearch(using=client).query(
+            Q('match', title='Higgs'))
+        response = await search.execute()
+        hits = []
+        async for doc in search.scan():
+            hits.append(doc)
+        return response, hits
+
+    loop = asyncio.new_event_loop()
+    try:
+        response, hits = loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+    assert [h.title for h in response] == ['Higgs']
+    assert [h.title for h in hits] == ['Higgs', 'Higgs']
+    assert [name for name, kwargs in client.calls] == [
+        'search', 'search', 'scroll', 'scroll', 'clear_scroll']
+    assert client.calls[1][1]['body']['sort'] == '_doc'
+
+
+def test_async_count(app):
+    """Test counting and unsupported methods of asynchronous searches."""
+    client = AsyncClient({'count': 42})
+    search = AsyncRecordsSearch(using=client).query(Q('match', title='W'))
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(search.count()) == 42
+    finally:
+        loop.close()
+    assert client.calls[0][0] == 'count'
+    assert client.calls[0][1]['body'] == {
+        'query': {'match': {'title': 'W'}}}
+
+    for name, args in (('mget', ([1], )), ('iter_records', ([1], )),
+                       ('iter_hits', ()), ('parallel_scan', (2, )),
+                       ('execute_deferred', ()), ('delete', ())):
+        with pytest.raises(NotImplementedError):
+            getattr(search, name)(*args)
+
+
+def test_async_create(app):
+    """Test asynchronous creation and deletion of indices."""
+    calls = []
+
+    class Indices(object):
+        def __getattr__(self, name):
+            async def method(**kwargs):
+                calls.append((name, kwargs.get('index')))
+                return {'acknowledged': True}
+            return method
+
+    class AsyncClient(object):
+        indices = Indices()
+
+    search = app.extensions['invenio-search']
+    search.register_mappings('records', 'mock_module.mappings')
+    # The default index was reindexed, its name is an alias of the copy.
+    search._client = MagicMock()
+    search._client.indices.get_alias.return_value = {
+        'records-default-v1.0.0-new': {'aliases': {
+            'records': {}, 'records-default-v1.0.0': {}}},
+    }
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        with patch.object(search, '_async_client_builder',
+                          return_value=AsyncClient()):
+            created = loop.run_until_complete(aio.create(state=search))
+            deleted = loop.run_until_complete(aio.delete(state=search))
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+    assert len(created) == len(deleted) == search.number_of_indexes
+    assert [name for name, index in calls] == \
+        ['create'] * 3 + ['update_aliases'] * 2 + ['delete'] * 3
+    assert set(index for name, index in calls if name == 'delete') == set([
+        'records-authorities-authority-v1.0.0',
+        'records-bibliographic-bibliographic-v1.0.0',
+        'records-default-v1.0.0-new',
+    ])
@@ -16,7 +16,7 @@ import ast
 from click.testing import CliRunner
 from elasticsearch import VERSION as ES_VERSION
 from flask.cli import ScriptInfo
-from mock import patch
+from mock import MagicMock, patch
 
 from invenio_search.cli import index as cmd
 from invenio_search.proxies import current_search_client
@@ -133,7 +133,112 @@ def test_check(app):
     result = runner.invoke(cmd, ['check'], obj=script_info)
     assert result.exit_code == 0
 
-    with patch('invenio_search.cli.ES_VERSION',
-               return_value=(ES_VERSION[0] + 1, 0, 0)):
+    with patch('elasticsearch.VERSION', (ES_VERSION[0] + 1, 0, 0)):
         result = runner.invoke(cmd, ['check'], obj=script_info)
         assert result.exit_code != 0
+
+
+def test_bulk(app):
+    """Test bulk indexing of JSON lines."""
+    search = app.extensions['invenio-search']
+    search._client = MagicMock()
+    search._client.info.return_value = {
+        'version': {'number': '{0}.0.0'.format(ES_VERSION[0])}}
+    actions = []
+
+    def bulk(iterable, **kwargs):
+        for action in iterable:
+            actions.append(action)
+            ok = action.get('_id') != 'conflict'
+            yield ok, {action['_op_type']: {'_id': action.get('_id')}}
+
+    runner = CliRunner()
+    script_info = ScriptInfo(create_app=lambda info: app)
+    lines = '\n'.join([
+        '{"_id": "1", "title": "One"}',
+        '',
+        '{"title": "Two"}',
+    ])
+    with patch.object(search, 'bulk', side_effect=bulk):
+        result = runner.invoke(
+            cmd, ['bulk', 'records', 'record'], input=lines, obj=script_info)
+        assert result.exit_code == 0
+        assert actions == [
+            {'_index': 'records', '_type': 'record', '_op_type': 'create',
+             '_id': '1', '_source': {'title': 'One'}},
+            {'_index': 'records', '_type': 'record', '_op_type': 'index',
+             '_source': {'title': 'Two'}},
+        ]
+        assert 'Indexed 2 documents (0 failed)' in result.output
+
+        del actions[:]
+        result = runner.invoke(
+            cmd, ['bulk', 'records', 'record', '--force'],
+            input='{"_id": "1"}\n', obj=script_info)
+        assert actions[0]['_op_type'] == 'index'
+
+        # Failed and malformed documents are reported.
+        lines = '\n'.join([
+            '{"_id": "conflict"}',
+            '{"title": ',
+            '["not", "an", "object"]',
+            '{"_id": "2"}',
+        ])
+        result = runner.invoke(
+            cmd, ['bulk', 'records', 'record'], input=lines, obj=script_info)
+        assert result.exit_code == 1
+        assert 'Invalid line 2 of <stdin>' in result.output
+        assert 'Invalid line 3 of <stdin>' in result.output
+        assert 'Indexed 1 documents (3 failed)' in result.output
+        assert '3 documents could not be indexed.' in result.output
+
+
+def test_rollover(app):
+    """Test the messages of the rollover command."""
+    app.config['SEARCH_ROLLOVER_ALIASES'] = {
+        'events': {'conditions': {'max_docs': 10}},
+        'logs': {},
+    }
+    search = app.extensions['invenio-search']
+    search._client = client = MagicMock()
+    client.info.return_value = {
+        'version': {'number': '{0}.0.0'.format(ES_VERSION[0])}}
+    client.indices.exists_alias.side_effect = lambda name: name == 'events'
+    client.indices.rollover.return_value = {
+        'rolled_over': True, 'old_index': 'events-000001',
+        'new_index': 'events-000002'}
+
+    runner = CliRunner()
+    script_info = ScriptInfo(create_app=lambda info: app)
+
+    result = runner.invoke(cmd, ['rollover'], obj=script_info)
+    assert result.exit_code == 0
+    assert 'Alias events rolled over to events-000002.' in result.output
+    assert 'Forcemerge events-000001.' in result.output
+    assert 'Bootstrap logs-000001.' in result.output
+
+    client.indices.rollover.return_value = {
+        'rolled_over': False, 'dry_run': True, 'new_index': 'events-000002',
+        'conditions': {'[max_docs: 10]': True}}
+    result = runner.invoke(
+        cmd, ['rollover', '--dry-run', 'events', 'logs'], obj=script_info)
+    assert result.exit_code == 0
+    assert 'Alias events would roll over to events-000002.' in result.output
+    assert 'Bootstrap logs-000001 (dry run).' in result.output
+
+    client.indices.rollover.return_value = {
+        'rolled_over': False, 'dry_run': True, 'new_index': 'events-000002',
+        'conditions': {'[max_docs: 10]': False}}
+    result = runner.invoke(
+        cmd, ['rollover', '--dry-run', 'events'], obj=script_info)
+    assert 'Alias events does not need a rollover.' in result.output
+
+    result = runner.invoke(cmd, ['rollover', 'unknown'], obj=script_info)
+    assert result.exit_code == 2
+    assert 'Rollover alias unknown is not configured.' in result.output
+
+    client.info.return_value = {'version': {'number': '2.4.6'}}
+    with patch('elasticsearch.VERSION', (2, 4, 0)):
+        result = runner.invoke(cmd, ['rollover'], obj=script_info)
+    assert result.exit_code == 2
+    assert 'Rollover requires Elasticsearch 5 or later' in result.output
@@ -11,13 +11,20 @@
 
 from __future__ import absolute_import, print_function
 
+import json
+import os
+import subprocess
+import sys
+
 import pytest
 from elasticsearch import VERSION as ES_VERSION
 from flask import Flask
-from mock import patch
+from mock import MagicMock, patch
 
 from invenio_search import InvenioSearch, current_search, current_search_client
-from invenio_search.utils import schema_to_index
+from invenio_search.errors import RolloverAliasNotConfigured
+from invenio_search.utils import JSONFileCache, LRUCache, freeze, \
+    schema_to_index, thaw
 
 
 def test_version():
@@ -26,6 +33,37 @@ def test_version():
     assert __version__
 
 
+def test_import_time():
+    """Test that importing the module does not load heavy dependencies."""
+    import invenio_search
+
+    modules = subprocess.check_output([
+        sys.executable, '-c',
+        'import sys, invenio_search; '
+        'print(" ".join(sorted(sys.modules)))'
+    ], cwd=os.path.dirname(os.path.dirname(invenio_search.__file__))
+    ).decode('utf-8').split()
+    assert 'elasticsearch_dsl' not in modules
+    assert 'elasticsearch' not in modules
+    assert 'pkg_resources' not in modules
+
+    # Registering mappings does not import the client either.
+    modules = subprocess.check_output([
+        sys.executable, '-c',
+        'import sys; sys.path.append("tests"); from flask import Flask; '
+        'from invenio_search import InvenioSearch; '
+        'ext = InvenioSearch(Flask("app")); '
+        'ext.register_mappings("records", "mock_module.mappings"); '
+        'print(" ".join(sorted(sys.modules)))'
+    ], cwd=os.path.dirname(os.path.dirname(invenio_search.__file__))
+    ).decode('utf-8').split()
+    assert 'mock_module' in modules
+    assert 'elasticsearch' not in modules
+
+    from invenio_search.api import RecordsSearch
+    assert invenio_search.RecordsSearch is RecordsSearch
+
+
 def test_init():
     """Test extension initialization."""
     app = Flask('testapp')
@@ -70,6 +108,88 @@ def test_client_reference():
         assert current_search_client == client2
 
 
+def test_client_config(app):
+    """Test configuration of the client."""
+    from elasticsearch.connection import Urllib3HttpConnection
+
+    # The default connections keep a pool of connections per host.
+    client = app.extensions['invenio-search']._client_builder()
+    connection = client.transport.connection_pool.connections[0]
+    assert isinstance(connection, Urllib3HttpConnection)
+    assert connection.pool.pool.maxsize == 25
+
+    app.config['SEARCH_ELASTIC_HOSTS'] = ['node1', 'node2']
+    app.config['SEARCH_CLIENT_CONFIG'] = dict(
+        connection_class='elasticsearch.connection.Urllib3HttpConnection',
+        maxsize=42,
+        max_retries=5,
+        retry_on_timeout=True,
+    )
+    client = app.extensions['invenio-search']._client_builder()
+    transport = client.transport
+    assert transport.max_retries == 5
+    assert transport.retry_on_timeout
+    connections = transport.connection_pool.connections
+    assert len(connections) == 2
+    assert all(isinstance(c, Urllib3HttpConnection) for c in connections)
+    assert connections[0].pool.pool.maxsize == 42
+
+
+def test_named_clients(app):
+    """Test named client profiles."""
+    from invenio_search import RecordsSearch, current_search_clients
+
+    app.config['SEARCH_CLIENT_CONFIG'] = dict(
+        connection_class='elasticsearch.connection.Urllib3HttpConnection')
+    app.config['SEARCH_CLIENTS'] = {
+        'analytics': dict(hosts=['analytics'], max_retries=7),
+    }
+
+    class AnalyticsSearch(RecordsSearch):
+        class Meta:
+            client_name = 'analytics'
+
+    with app.app_context():
+        client = current_search_clients['analytics']
+        assert client.transport.max_retries == 7
+        assert current_search_clients['analytics'] is client
+        assert current_search_clients['default'] is \
+            current_search_client._get_current_object()
+        assert 'analytics' in current_search_clients
+        assert 'unknown' not in current_search_clients
+        with pytest.raises(KeyError):
+            current_search_clients['unknown']
+
+        assert AnalyticsSearch()._using._get_current_object() is client
+        assert RecordsSearch()._using._get_current_object() is \
+            current_search_client._get_current_object()
+
+
+def test_client_lifecycle(app):
+    """Test that clients are rebuilt after a fork and can be closed."""
+    search = app.extensions['invenio-search']
+    with patch.object(search, '_client_builder',
+                      side_effect=lambda name='default': MagicMock()):
+        client = search.client
+        with patch.object(search, '_clients_lock') as lock:
+            assert search.client is client
+        assert not lock.__enter__.called
+
+        with patch('os.getpid', return_value=-1):
+            child_client = search.client
+            assert child_client is not client
+            assert search.client is child_client
+        client.transport.close.assert_not_called()
+
+        search.reset_client()
+        client = search.client
+        assert client is not child_client
+
+        search.close()
+        client.transport.close.assert_called_once_with()
+        assert search.client is not client
+
+
 def test_default_client(app):
     """Test default client."""
     with app.app_context():
@@ -158,3 +278,489 @@ def test_whitelisted_aliases(app, aliases_config, expected_aliases):
             assert current_search_client.indices.exists(expected_aliases)
 
     app.config['SEARCH_MAPPINGS'] = orig
+
+
+@pytest.mark.parametrize('workers', [None, 4])
+def test_create_order(app, workers):
+    """Test that indices are created before their aliases."""
+    search = app.extensions['invenio-search']
+    search.register_mappings('records', 'mock_module.mappings')
+    search._client = MagicMock()
+
+    names = [name for name, response in search.create(workers=workers)]
+    assert set(names[:3]) == set([
+        'records-authorities-authority-v1.0.0',
+        'records-bibliographic-bibliographic-v1.0.0',
+        'records-default-v1.0.0',
+    ])
+    assert set(names[3:5]) == set([
+        'records-authorities',
+        'records-bibliographic',
+    ])
+    assert names[5] == 'records'
+    assert search._client.indices.create.call_count == 3
+    assert search._client.indices.update_aliases.call_count == 1
+
+
+def test_create_skip_existing(app):
+    """Test creation of the missing indices and aliases only."""
+    search = app.extensions['invenio-search']
+    search.register_mappings('records', 'mock_module.mappings')
+    search._client = client = MagicMock()
+
+    default = 'records-default-v1.0.0'
+    mapping = search.get_mapping_body(default)['mappings']
+    client.indices.get_mapping.return_value = {
+        default: {'mappings': mapping},
+        'records-authorities-authority-v1.0.0': {'mappings': {
+            'authority': {'properties': {'title': {'type': 'text'}}}}},
+    }
+    client.indices.get_alias.return_value = {
+        default: {'aliases': {'records': {}}},
+        'records-authorities-authority-v1.0.0': {'aliases': {}},
+    }
+
+    indices, aliases = search.plan_create()
+    assert indices == ['records-bibliographic-bibliographic-v1.0.0']
+    # Only the aliases are needed to find the missing indices.
+    assert not client.indices.get_mapping.called
+    aliases = dict((alias, set(indices)) for alias, indices in aliases)
+    assert aliases == {
+        'records': set(['records-authorities-authority-v1.0.0',
+                        'records-bibliographic-bibliographic-v1.0.0']),
+        'records-authorities': set(['records-authorities-authority-v1.0.0']),
+        'records-bibliographic': set([
+            'records-bibliographic-bibliographic-v1.0.0']),
+    }
+
+    results = dict(search.create(skip_existing=True))
+    assert results[default] is None
+    client.indices.create.assert_called_once()
+    assert client.indices.create.call_args[1]['index'] == \
+        'records-bibliographic-bibliographic-v1.0.0'
+    actions = client.indices.update_aliases.call_args[1]['body']['actions']
+    assert {'add': {'index': default, 'alias': 'records'}} not in actions
+    assert len(actions) == 4
+
+    client.indices.get_alias.reset_mock()
+    existing = search.get_existing_indices()
+    assert search.plan_create(existing)[0] == indices
+    diffs = dict((name, (status, diff))
+                 for name, status, diff in search.diff_mappings(existing))
+    assert client.indices.get_alias.call_count == 1
+    assert diffs[default] == ('unchanged', [])
+    assert diffs['records-bibliographic-bibliographic-v1.0.0'][0] == \
+        'missing'
+    status, diff = diffs['records-authorities-authority-v1.0.0']
+    assert status == 'changed'
+    assert diff[0].startswith('--- records-authorities-authority-v1.0.0')
+
+
+def test_diff_mappings(app):
+    """Test that created indices have the registered mappings."""
+    search = app.extensions['invenio-search']
+    search.register_mappings('records', 'mock_module.mappings')
+
+    with app.app_context():
+        current_search_client.indices.delete_alias('_all', '_all',
+                                                   ignore=[400, 404])
+        current_search_client.indices.delete('*')
+        list(current_search.create(ignore=None))
+
+        diffs = list(current_search.diff_mappings())
+        assert len(diffs) == 3
+        assert all(status == 'unchanged' and diff == []
+                   for name, status, diff in diffs), diffs
+
+        list(current_search.delete(ignore=[404]))
+
+
+def test_update_aliases(app):
+    """Test batching of alias actions."""
+    search = app.extensions['invenio-search']
+    search.register_mappings('records', 'mock_module.mappings')
+    search._client = MagicMock()
+
+    names = [name for name, response in search.delete()]
+    assert set(names) == set([
+        'records',
+        'records-authorities',
+        'records-bibliographic',
+        'records-authorities-authority-v1.0.0',
+        'records-bibliographic-bibliographic-v1.0.0',
+        'records-default-v1.0.0',
+    ])
+    update_aliases = search._client.indices.update_aliases
+    assert update_aliases.call_count == 1
+    actions = update_aliases.call_args[1]['body']['actions']
+    assert len(actions) == 5
+    assert {'remove': {'index': 'records-default-v1.0.0',
+                       'alias': 'records'}} in actions
+    assert search._client.indices.delete.call_count == 3
+
+    app.config['SEARCH_ALIASES_CHUNK_SIZE'] = 1
+    update_aliases.reset_mock()
+    list(search.create())
+    assert update_aliases.call_count == 3
+
+
+def test_reindex(app):
+    """Test reindexing of a registered index."""
+    search = app.extensions['invenio-search']
+    search.register_mappings('records', 'mock_module.mappings')
+    search._client = client = MagicMock()
+    index = 'records-default-v1.0.0'
+    target = 'records-default-v1.0.0-new'
+    client.indices.get_alias.return_value = {
+        index: {'aliases': {'records': {}}},
+    }
+    client.indices.get_settings.side_effect = lambda index: {
+        index: {'settings': {'index': {'number_of_replicas': '2'}}}
+    }
+    client.reindex.return_value = {'task': 'node:1'}
+    client.tasks.get.side_effect = [
+        {'completed': False},
+        {'completed': True, 'response': {'total': 0, 'failures': []}},
+    ]
+
+    steps = [step for step, response in search.reindex(
+        index, suffix='new', slices=2, poll_interval=0)]
+    assert steps == ['create', 'reindex', 'aliases']
+    assert client.indices.create.call_args[1]['index'] == target
+    assert client.reindex.call_args[1]['slices'] == 2
+    assert client.reindex.call_args[1]['wait_for_completion'] is False
+    assert client.tasks.get.call_count == 2
+    assert client.reindex.call_args[1]['body']['source']['index'] == [index]
+    assert client.indices.put_settings.call_args[1]['body'] == {'index': {
+        'refresh_interval': '1s',
+        'number_of_replicas': '2',
+    }}
+    assert client.indices.update_aliases.call_args[1]['body'] == {
+        'actions': [
+            {'remove': {'index': index, 'alias': 'records'}},
+            {'add': {'index': target, 'alias': 'records'}},
+        ]
+    }
+    client.indices.delete.assert_not_called()
+
+    # The registered name becomes an alias of the new index.
+    newer = 'records-default-v1.0.0-newer'
+    client.tasks.get.side_effect = None
+    client.tasks.get.return_value = {
+        'completed': True, 'response': {'total': 0, 'failures': []}}
+    list(search.reindex(index, suffix='newer', delete_old=True))
+    assert client.reindex.call_args[1]['body']['source']['index'] == [index]
+    assert client.indices.update_aliases.call_args[1]['body'] == {
+        'actions': [
+            {'add': {'index': newer, 'alias': 'records'}},
+            {'add': {'index': newer, 'alias': index}},
+            {'remove_index': {'index': index}},
+        ]
+    }
+
+    # Later reindexing copies and replaces the index behind the alias.
+    client.indices.get_alias.return_value = {
+        newer: {'aliases': {'records': {}, index: {}}},
+    }
+    list(search.reindex(index, suffix='newest'))
+    assert client.reindex.call_args[1]['body']['source']['index'] == [newer]
+    assert client.indices.update_aliases.call_args[1]['body'] == {
+        'actions': [
+            {'remove': {'index': newer, 'alias': 'records'}},
+            {'remove': {'index': newer, 'alias': index}},
+            {'add': {'index': index + '-newest', 'alias': 'records'}},
+            {'add': {'index': index + '-newest', 'alias': index}},
+        ]
+    }
+
+    # The registry resolves the alias to the index behind it.
+    assert index not in search.plan_create()[0]
+    list(search.delete())
+    assert newer in [call[1]['index']
+                     for call in client.indices.delete.call_args_list]
+
+    # The new index is deleted if the copy fails.
+    client.indices.delete.reset_mock()
+    client.tasks.get.return_value = {
+        'completed': True, 'response': {'failures': [{'id': '1'}]}}
+    with pytest.raises(RuntimeError):
+        list(search.reindex(index, suffix='failed'))
+    client.indices.delete.assert_called_once_with(
+        index=index + '-failed', ignore=[404])
+
+    client.indices.get_alias.return_value = {}
+    with pytest.raises(ValueError):
+        list(search.reindex(index))
+    with pytest.raises(KeyError):
+        list(search.reindex('records'))
+
+
+def test_bulk(app):
+    """Test bulk indexing with retries of rejected actions."""
+    from elasticsearch.serializer import JSONSerializer
+
+    search = app.extensions['invenio-search']
+    search._client = client = MagicMock()
+    client.transport.serializer = JSONSerializer()
+    client.bulk.side_effect = [
+        {'items': [{'index': {'status': 201}}, {'index': {'status': 429}}]},
+        {'items': [{'index': {'status': 400}}]},
+        {'items': [{'index': {'status': 201}}]},
+    ]
+
+    actions = ({'_index': 'test', '_type': 'test', '_id': i, 'title': i}
+               for i in range(3))
+    results = list(search.bulk(actions, chunk_size=2, initial_backoff=0))
+    assert [ok for ok, result in results] == [True, False, True]
+    assert client.bulk.call_count == 3
+    retried = client.bulk.call_args_list[1][1]['body']
+    assert retried.count('\n') == 2
+    assert '"_id":1' in retried
+
+
+def test_routing(app):
+    """Test routing of documents by a registered field."""
+    from elasticsearch.serializer import JSONSerializer
+
+    search = app.extensions['invenio-search']
+    search.aliases = {'records': {'records-a': 'a.json', 'records-b': {
+        'records-b-v1': 'b.json'}}}
+    search.register_routing('records', 'owner.id')
+    search.register_routing('records-b-v1', 'community')
+
+    assert search.get_routing_field('records') == 'owner.id'
+    assert search.get_routing_field('records-a') == 'owner.id'
+    assert search.get_routing_field('records-b') == 'owner.id'
+    assert search.get_routing_field('records-b-v1') == 'community'
+    assert search.get_routing_field('authors') is None
+    assert search.get_routing('records-a', {'owner': {'id': 1}}) == '1'
+    assert search.get_routing('records-a', {'owner': 1}) is None
+    assert search.get_routing('authors', {'owner': {'id': 1}}) is None
+
+    search._client = client = MagicMock()
+    client.transport.serializer = JSONSerializer()
+    client.bulk.return_value = {'items': [
+        {'index': {'status': 201}}, {'index': {'status': 201}}]}
+    list(search.bulk([
+        {'_index': 'records-a', '_type': 'test', '_id': 1,
+         '_source': {'owner': {'id': 5}}},
+        {'_index': 'records-a', '_type': 'test', '_id': 2, '_routing': 'x',
+         'owner': {'id': 6}},
+    ]))
+    ops = [json.loads(line)['index'] for line
+           in client.bulk.call_args[1]['body'].splitlines()[::2]]
+    key = '_routing' if ES_VERSION[0] < 7 else 'routing'
+    assert ops[0][key] == '5'
+    assert ops[1]['_routing'] == 'x'
+
+    with pytest.raises(ValueError):
+        list(search.bulk([{'_op_type': 'delete', '_index': 'records-a',
+                           '_type': 'test', '_id': 1}]))
+
+
+def test_rollover(app):
+    """Test rollover of write aliases and retention of old generations."""
+    app.config['SEARCH_ROLLOVER_ALIASES'] = {
+        'events': {'conditions': {'max_docs': 10}, 'max_generations': 2},
+        'logs': {},
+    }
+    search = app.extensions['invenio-search']
+    search._client = client = MagicMock()
+    client.indices.exists_alias.side_effect = lambda name: name == 'events'
+    client.indices.rollover.return_value = {
+        'rolled_over': True, 'old_index': 'events-000003',
+        'new_index': 'events-000004'}
+    client.indices.get_alias.return_value = dict(
+        (index, {}) for index in ('events-000002', 'events-000003',
+                                  'events-000004', 'events-stats-000001'))
+
+    steps = [(step, name) for step, name, response in search.rollover()]
+    assert steps == [
+        ('rollover', 'events'),
+        ('forcemerge', 'events-000003'),
+        ('delete', 'events-000002'),
+        ('bootstrap', 'logs-000001'),
+    ]
+    assert client.indices.rollover.call_args[1]['body'] == {
+        'conditions': {'max_docs': 10}}
+    assert client.indices.forcemerge.call_args[1]['request_timeout'] == 3600
+    client.indices.delete.assert_called_once_with(index='events-000002')
+    client.indices.create.assert_called_once_with(
+        index='logs-000001', body={'aliases': {'logs': {}}})
+
+    client.reset_mock()
+    client.indices.rollover.return_value = {
+        'rolled_over': False, 'dry_run': True, 'new_index': 'events-000004',
+        'conditions': {'[max_docs: 10]': True}}
+    client.indices.get_alias.return_value = dict(
+        (index, {}) for index in ('events-000002', 'events-000003'))
+    steps = [(step, name) for step, name, response
+             in search.rollover(['events'], dry_run=True)]
+    assert steps == [('rollover', 'events'), ('delete', 'events-000002')]
+    assert not client.indices.delete.called
+    assert not client.indices.forcemerge.called
+
+    with pytest.raises(RolloverAliasNotConfigured):
+        list(search.rollover(['unknown']))
+
+
+def test_sync_templates(app, tmpdir):
+    """Test upload of changed templates only."""
+    body = {'index_patterns': ['events-*'],
+            'settings': {'number_of_shards': 1, 'index.refresh_interval': -1},
+            'mappings': {'doc': {'properties': {
+                'count': {'type': 'integer', 'doc_values': True}}}}}
+    templates = {}
+    for name in ('a', 'b', 'c'):
+        path = tmpdir.join(name + '.json')
+        path.write(json.dumps(body))
+        templates[name] = str(path)
+
+    search = app.extensions['invenio-search']
+    search.__dict__['templates'] = templates
+    search._client = client = MagicMock()
+    existing = {
+        'order': 0,
+        'index_patterns': ['events-*'],
+        'settings': {'index': {'number_of_shards': '1',
+                               'refresh_interval': '-1'}},
+        'mappings': {'doc': {'properties': {
+            'count': {'type': 'integer', 'doc_values': 'true'}}}},
+        'aliases': {},
+    }
+    client.indices.get_template.return_value = {
+        'a': existing, 'b': dict(existing, order=1)}
+
+    results = sorted(
+        (name, status) for name, status, response
+        in search.sync_templates(workers=2))
+    assert results == [('a', 'skipped'), ('b', 'updated'), ('c', 'created')]
+    assert client.indices.get_template.call_args[1]['name'] == 'a,b,c'
+    assert sorted(call[1]['name'] for call
+                  in client.indices.put_template.call_args_list) == ['b', 'c']
+
+    client.reset_mock()
+    responses = dict(search.put_templates(force=True))
+    assert set(responses) == set(templates.values())
+    assert not client.indices.get_template.called
+    assert client.indices.put_template.call_count == 3
+
+
+def test_freeze():
+    """Test immutable copies of JSON-like objects."""
+    data = {'mappings': {'properties': {'title': {'type': 'text'}}},
+            'aliases': ['a', 'b']}
+    frozen = freeze(data)
+    assert frozen == {'mappings': {'properties': {'title': {'type': 'text'}}},
+                      'aliases': ('a', 'b')}
+    with pytest.raises(TypeError):
+        frozen['mappings']['properties'] = {}
+    with pytest.raises(TypeError):
+        frozen.update(settings={})
+    assert thaw(frozen) == data
+    assert json.loads(json.dumps(frozen)) == data
+
+
+def test_lru_cache():
+    """Test the in-process results cache."""
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+
+    cache.set('d', 4, timeout=-1)
+    assert cache.get('d') is None
+
+    assert cache.inc('gen') == 1
+    assert cache.inc('gen') == 2
+    cache.set('e', 5)
+    cache.set('f', 6)
+    assert cache.get('gen') == 2
+    cache.clear()
+    assert cache.get('gen') is None
+
+
+def test_json_file_cache(tmpdir):
+    """Test caching of parsed JSON files."""
+    path = tmpdir.join('mapping.json')
+    path.write('{"mappings": {}}')
+    cache = JSONFileCache()
+
+    body = cache.get(str(path))
+    assert body == {'mappings': {}}
+    assert cache.get(str(path)) is body
+
+    path.write('{"settings": {}}')
+    path.setmtime(path.mtime() + 10)
+    assert cache.get(str(path)) is body
+    assert cache.get(str(path), check_mtime=True) == {'settings': {}}
+
+
+def test_get_mapping_body(app):
+    """Test retrieval of registered mapping bodies."""
+    search = app.extensions['invenio-search']
+    search.register_mappings('records', 'mock_module.mappings')
+
+    body = search.get_mapping_body('records-default-v1.0.0')
+    assert 'mappings' in body
+    assert search.get_mapping_body('records-default-v1.0.0') is body
+    with pytest.raises(KeyError):
+        search.get_mapping_body('records')
+
+
+def test_manifest(tmpdir):
+    """Test loading of registered mappings from a manifest."""
+    class ep(object):
+        name = 'records'
+        module_name = 'mock_module.mappings'
+
+    path = str(tmpdir.join('manifest.json'))
+    app = Flask('testapp')
+    app.config['SEARCH_REGISTRY_MANIFEST'] = path
+
+    with patch('invenio_search.ext.iter_entry_points',
+               side_effect=lambda group: iter([ep])):
+        ext = InvenioSearch(app, entry_point_group_templates=None)
+        ext.write_manifest(path)
+        aliases = ext.aliases
+
+        app = Flask('testapp')
+        app.config['SEARCH_REGISTRY_MANIFEST'] = path
+        with patch('invenio_search.ext.resource_listdir',
+                   side_effect=AssertionError):
+            ext = InvenioSearch(app, entry_point_group_templates=None)
+        assert ext.aliases == aliases
+        assert ext.number_of_indexes == 6
+        assert 'mappings' in ext.get_mapping_body('records-default-v1.0.0')
+
+    # Outdated manifests are ignored.
+    ep.module_name = 'mock_module.other'
+    with patch('invenio_search.ext.iter_entry_points',
+               side_effect=lambda group: iter([ep])), \
+            patch('invenio_search.ext._SearchState.register_mappings') as reg:
+        InvenioSearch(app, entry_point_group_templates=None)
+        reg.assert_called_once_with('records', 'mock_module.other')
+
+
+def test_compat_resources():
+    """Test package resources discovery without pkg_resources."""
+    import pkg_resources
+    from invenio_search import _compat
+
+    package = 'mock_module.mappings'
+    for resource in ('v6', 'v6/records', 'v6/records/default-v1.0.0.json'):
+        assert _compat.resource_isdir(package, resource) == \
+            pkg_resources.resource_isdir(package, resource)
+        assert _compat.resource_filename(package, resource) == \
+            pkg_resources.resource_filename(package, resource)
+    assert sorted(_compat.resource_listdir(package, 'v6/records')) == \
+        sorted(pkg_resources.resource_listdir(package, 'v6/records'))
+    with pytest.raises(OSError):
+        _compat.resource_listdir(package, 'does-not-exist')
+
+    eps = list(_compat.iter_entry_points('console_scripts', name='pytest'))
+    assert eps and eps[0].load().__module__ == eps[0].module_name
+    assert eps[0].dist.project_name == 'pytest'
@@ -11,12 +11,14 @@
 
 from __future__ import absolute_import, print_function
 
-import hashlib
+import zlib
 
+import pytest
 from elasticsearch_dsl import Q, Search
-from flask import request
+from flask import g, request
+from mock import MagicMock
 
-from invenio_search.api import DefaultFilter, RecordsSearch
+from invenio_search.api import DefaultFilter, RecordsMultiSearch, RecordsSearch
 
 
 def test_empty_query(app):
@@ -96,6 +98,38 @@ def test_elasticsearch_query(app):
         ]
 
 
+def test_default_filter_cache(app):
+    """Test caching of parsed default filters."""
+    from flask import g
+
+    parser = MagicMock(side_effect=lambda query: Q('query_string',
+                                                   query=query))
+
+    class TestSearch(RecordsSearch):
+        class Meta:
+            default_filter = DefaultFilter(
+                lambda: '_access.owner:{0}'.format(g.owner),
+                query_parser=parser, cache_size=2,
+            )
+
+    with app.app_context():
+        for owner in (1, 1, 2, 1):
+            g.owner = owner
+            assert TestSearch().to_dict()['query']['bool']['filter'] == [
+                {'query_string': {'query': '_access.owner:{0}'.format(owner)}}
+            ]
+        assert parser.call_count == 2
+
+        first = TestSearch.Meta.default_filter
+        assert first == TestSearch.Meta.default_filter
+        assert first is not TestSearch.Meta.default_filter
+
+        # Unhashable queries are parsed every time.
+        default_filter = DefaultFilter(lambda: {'term': {'owner': 1}},
+                                       query_parser=Q)
+        assert default_filter.__get__(None, None) == Q('term', owner=1)
+
+
 class SpySearch(Search):
     exposed_params = {}
 
@@ -122,11 +156,345 @@ def test_es_preference_param(app):
         rs = RecordsSearch()
         new_rs = rs.with_preference_param()
 
-        alg = hashlib.md5()
-        encoded_user_agent = 'Chrome'.encode('utf8')
-        encoded_user_string = '{ip}-{ua}'.format(ip=request.remote_addr,
-                                                 ua=encoded_user_agent)
-        alg.update(encoded_user_string.encode('utf8'))
-        digest = alg.hexdigest()
+        user_string = '{ip}-{ua}'.format(ip=request.remote_addr, ua='Chrome')
+        digest = '{0:08x}'.format(
+            zlib.crc32(user_string.encode('utf8')) & 0xffffffff)
 
         assert new_rs.exposed_params == dict(preference=digest)
+
+
+def test_es_preference_strategy(app):
+    """Test the configurable preference strategy."""
+    strategy = MagicMock(return_value='user-1')
+    app.config['SEARCH_PREFERENCE_STRATEGY'] = strategy
+
+    with app.test_request_context('/'):
+        first = RecordsSearch().with_preference_param()._params
+        second = RecordsSearch().with_preference_param()._params
+        assert first == second
+        assert first['preference'] != ''
+        assert strategy.call_count == 1
+
+    with app.test_request_context('/'):
+        strategy.return_value = None
+        assert RecordsSearch().with_preference_param()._params == {}
+
+    app.config['SEARCH_PREFERENCE_STRATEGY'] = \
+        'invenio_search.api:session_preference'
+    with app.test_request_context('/', headers={'User-Agent': 'Chrome'}):
+        assert 'preference' in RecordsSearch().with_preference_param()._params
+
+
+def test_deferred_searches(app):
+    """Test batching of deferred searches in a single request."""
+    hit = {'_index': 'records', '_type': 'record', '_id': '1',
+           '_source': {'title': 'Higgs'}}
+    client = MagicMock()
+    client.msearch.return_value = {'responses': [
+        {'hits': {'total': 1, 'hits': [hit]}},
+        {'hits': {'total': 0, 'hits': []}},
+    ]}
+
+    with app.app_context():
+        first = RecordsSearch(index='records', using=client) \
+            .params(preference='abc')
+        second = RecordsSearch(index='authors', using=client)
+        first_response = first.execute_deferred()
+        second_response = second.execute_deferred()
+        assert not client.msearch.called
+
+        assert [h.title for h in first_response] == ['Higgs']
+        assert len(second_response) == 0
+        assert first.execute() is first_response._get_current_object()
+        assert client.msearch.call_count == 1
+        body = client.msearch.call_args[1]['body']
+        assert body[0] == {'index': ['records'], 'preference': 'abc'}
+        assert body[2] == {'index': ['authors']}
+
+        # New searches start a new batch.
+        RecordsSearch(index='records', using=client).execute_deferred()
+        assert len(g._invenio_search_batches) == 1
+        batch = list(g._invenio_search_batches.values())[0]
+        assert not batch.executed
+
+
+def test_multi_search_errors(app):
+    """Test failures of searches in a batch."""
+    from elasticsearch.exceptions import TransportError
+
+    client = MagicMock()
+    client.msearch.return_value = {'responses': [
+        {'error': {'type': 'index_not_found_exception'}},
+    ]}
+    with app.app_context():
+        batch = RecordsMultiSearch(using=client)
+        batch.add(RecordsSearch(index='missing'))
+        with pytest.raises(TransportError):
+            batch.execute()
+        assert batch.execute(raise_on_error=False) == [None]
+
+
+def test_results_cache(app):
+    """Test caching of search responses."""
+    from invenio_search.proxies import current_search
+
+    class CachedSearch(RecordsSearch):
+        class Meta:
+            index = 'records'
+            cache_ttl = 60
+
+    hit = {'_index': 'records', '_type': 'record', '_id': '1',
+           '_source': {'title': 'Higgs'}}
+    client = MagicMock()
+    client.search.return_value = {'hits': {'total': 1, 'hits': [hit]}}
+
+    with app.app_context():
+        response = CachedSearch(using=client).execute()
+        assert [h.title for h in response] == ['Higgs']
+        CachedSearch(using=client).params(preference='abc').execute()
+        assert client.search.call_count == 1
+
+        CachedSearch(using=client).query(Q('match', title='W')).execute()
+        assert client.search.call_count == 2
+
+        current_search.invalidate_cache('records')
+        CachedSearch(using=client).execute()
+        assert client.search.call_count == 3
+        CachedSearch(using=client).execute(ignore_cache=True)
+        assert client.search.call_count == 4
+
+        # Searches without TTL are not cached.
+        RecordsSearch(index='records', using=client).execute()
+        RecordsSearch(index='records', using=client).execute()
+        assert client.search.call_count == 6
+
+        # Invalidating an alias or _all invalidates the indices behind it.
+        current_search.register_mappings('records', 'mock_module.mappings')
+
+        class AuthoritySearch(CachedSearch):
+            class Meta:
+                index = 'records-authorities-authority-v1.0.0'
+                cache_ttl = 60
+
+        AuthoritySearch(using=client).execute()
+        for name in ('records', 'records-authorities', '_all'):
+            count = client.search.call_count
+            AuthoritySearch(using=client).execute()
+            assert client.search.call_count == count
+            current_search.invalidate_cache(name)
+            AuthoritySearch(using=client).execute()
+            assert client.search.call_count == count + 1
+
+
+def test_mget(app):
+    """Test fetching records with a multi-get request."""
+    from elasticsearch.exceptions import TransportError
+    from invenio_search.proxies import current_search
+
+    def doc(id_, found=True):
+        return {'_index': 'records', '_type': 'record', '_id': id_,
+                'found': found, '_source': {'title': 'Record ' + id_}}
+
+    client = MagicMock()
+    client.mget.return_value = {'docs': [doc('2'), doc('3', False), doc('1')]}
+    client.search.return_value = {'hits': {'total': 2, 'hits': [
+        doc('1'), doc('2')]}}
+
+    with app.app_context():
+        search = RecordsSearch(index='records', using=client)
+        assert search.mget([]) == []
+        hits = search.mget([2, 3, 1])
+        assert [h.title for h in hits] == ['Record 2', 'Record 1']
+        assert client.mget.call_args[1]['body'] == {'ids': ['2', '3', '1']}
+        assert not client.search.called
+
+        # Queries and filters can not be applied by a multi-get request.
+        hits = search.filter('term', public=1).mget([2, 1])
+        assert [h.title for h in hits] == ['Record 2', 'Record 1']
+        assert client.search.call_count == 1
+        assert client.mget.call_count == 1
+
+        # So is source filtering, hidden fields must not be returned.
+        search.source(excludes=['secret']).mget([2, 1])
+        assert client.search.call_count == 2
+        assert client.search.call_args[1]['body']['_source'] == {
+            'excludes': ['secret']}
+        assert client.mget.call_count == 1
+        search.sort('title').mget([2, 1])
+        assert client.mget.call_count == 2
+
+        client.mget.side_effect = TransportError(400, 'illegal_argument')
+        hits = search.mget([2, 1])
+        assert [h.title for h in hits] == ['Record 2', 'Record 1']
+        assert client.search.call_count == 3
+
+        # Routed documents are searched, unless the routing is given.
+        client.mget.side_effect = None
+        current_search.register_routing('records', 'owner')
+        search.mget([2, 1])
+        assert client.search.call_count == 4
+        assert client.mget.call_count == 3
+        search.params(routing='5').mget([2, 1])
+        assert client.mget.call_count == 4
+        assert client.mget.call_args[1]['routing'] == '5'
+
+
+def test_iter_records(app):
+    """Test fetching long lists of records in chunks."""
+    def mget(index, body, **kwargs):
+        return {'docs': [
+            {'_index': index, '_type': 'record', '_id': id_,
+             'found': id_ != '3', '_source': {'title': 'Record ' + id_}}
+            for id_ in body['ids']
+        ]}
+
+    client = MagicMock()
+    client.mget.side_effect = mget
+
+    with app.app_context():
+        search = RecordsSearch(index='records', using=client)
+        ids = [str(i) for i in range(10)]
+        hits = search.iter_records(iter(ids), chunk_size=3, workers=2)
+        assert [h.meta.id for h in hits] == [i for i in ids if i != '3']
+        assert client.mget.call_count == 4
+        assert max(len(call[1]['body']['ids'])
+                   for call in client.mget.call_args_list) == 3
+
+        hits = search.iter_records(ids, chunk_size=3, workers=3,
+                                   ordered=False)
+        assert sorted(h.meta.id for h in hits) == \
+            sorted(i for i in ids if i != '3')
+
+
+def test_search_after(app):
+    """Test cursor pagination."""
+    from elasticsearch import VERSION as ES_VERSION
+    from invenio_search.utils import decode_cursor, encode_cursor
+
+    tiebreaker = '_uid' if ES_VERSION[0] < 6 else '_id'
+
+    def hit(id_):
+        return {'_index': 'records', '_type': 'record', '_id': id_,
+                'sort': ['Title', id_], '_source': {'title': 'Title'}}
+
+    client = MagicMock()
+    client.search.side_effect = [
+        {'hits': {'total': 3, 'hits': [hit('1'), hit('2')]}},
+        {'hits': {'total': 3, 'hits': [hit('3')]}},
+    ]
+
+    with app.app_context():
+        search = RecordsSearch(index='records', using=client) \
+            .sort('-title')[4:6].after()
+        body = search.to_dict()
+        assert body['sort'] == [{'title': {'order': 'desc'}}, tiebreaker]
+        assert 'from' not in body and 'search_after' not in body
+        assert RecordsSearch().after().to_dict()['sort'] == [
+            '_score', tiebreaker]
+
+        cursor = encode_cursor(['Title', '2'])
+        assert decode_cursor(cursor) == ['Title', '2']
+        assert search.after(cursor).to_dict()['search_after'] == \
+            ['Title', '2']
+        with pytest.raises(ValueError):
+            search.after('invalid')
+
+        search = RecordsSearch(index='records', using=client).sort('title')
+        assert [h.meta.id for h in search.iter_hits(size=2)] == \
+            ['1', '2', '3']
+        first, second = [c[1]['body'] for c in client.search.call_args_list]
+        assert 'search_after' not in first
+        assert second['search_after'] == ['Title', '2']
+        assert second['size'] == 2
+
+
+def test_parallel_scan(app):
+    """Test scrolling slices concurrently."""
+    def search(body, **kwargs):
+        slice_id = body['slice']['id']
+        return {'_scroll_id': 's{0}'.format(slice_id),
+                '_shards': {'successful': 1, 'total': 1},
+                'hits': {'hits': [
+                    {'_index': 'records', '_type': 'record',
+                     '_id': '{0}-{1}'.format(slice_id, i), '_source': {}}
+                    for i in range(3)
+                ]}}
+
+    client = MagicMock()
+    client.search.side_effect = search
+    client.scroll.return_value = {
+        '_scroll_id': 's', '_shards': {'successful': 1, 'total': 1},
+        'hits': {'hits': []}}
+
+    with app.app_context():
+        records = RecordsSearch(index='records', using=client)
+        ids = [h.meta.id for h in records.parallel_scan(3, buffer_size=2)]
+        assert sorted(ids) == sorted(
+            '{0}-{1}'.format(s, i) for s in range(3) for i in range(3))
+        assert sorted(c[1]['body']['slice']['id']
+                      for c in client.search.call_args_list) == [0, 1, 2]
+
+        scans = records.parallel_scan(2, merge=False)
+        assert [len(list(scan)) for scan in scans] == [3, 3]
+
+        # Stopping early stops all the slices.
+        hits = records.parallel_scan(3, buffer_size=1)
+        next(hits)
+        hits.close()
+
+        client.search.side_effect = ValueError('failure')
+        with pytest.raises(ValueError):
+            list(records.parallel_scan(2))
+
+
+def test_faceted_search_class(app):
+    """Test reuse of the faceted search classes."""
+    from elasticsearch_dsl import TermsFacet
+
+    class FacetedSearch(RecordsSearch):
+        class Meta:
+            index = 'records'
+            facets = {'type': TermsFacet(field='type')}
+
+    with app.app_context():
+        first = FacetedSearch.faceted_search('Higgs')
+        second = FacetedSearch.faceted_search(
+            filters={'type': ['article']})
+        assert type(first) is type(second)
+        assert type(first).index == 'records'
+        assert type(first).facets == FacetedSearch.Meta.facets
+        assert type(RecordsSearch.faceted_search()) is not type(first)
+        assert type(FacetedSearch.faceted_search(
+            search=FacetedSearch(index='authors'))) is not type(first)
+
+        search = FacetedSearch().params(preference='abc')
+        faceted = FacetedSearch.faceted_search(search=search)
+        assert faceted._s._params == {'preference': 'abc'}
+        assert 'type' in second._s.to_dict()['post_filter']['terms']
+
+
+def test_search_routing(app):
+    """Test routing of searches filtering on the routing field."""
+    from invenio_search.proxies import current_search
+
+    client = MagicMock()
+    client.search.return_value = {'hits': {'total': 0, 'hits': []}}
+    client.count.return_value = {'count': 0}
+
+    with app.app_context():
+        current_search.register_routing('records', 'owner')
+        search = RecordsSearch(index='records', using=client)
+
+        search.filter('term', owner=1).execute()
+        assert client.search.call_args[1]['routing'] == '1'
+        search.query('match', title='Higgs') \
+            .filter('terms', owner=[1, 2]).count()
+        assert client.count.call_args[1]['routing'] == '1,2'
+
+        search.query('match', owner=1).execute()
+        assert 'routing' not in client.search.call_args[1]
+        search.filter('term', owner=1).params(routing='3').execute()
+        assert client.search.call_args[1]['routing'] == '3'
+        RecordsSearch(index='authors', using=client) \
+            .filter('term', owner=1).execute()
+        assert 'routing' not in client.search.call_args[1]